@@ -30,33 +30,54 @@ def simulate_sampling_plan(true_defect_rate, nominal_defect_rate, sample_size, n
     
     return reject_rate, accept_rate
 
-# 验证参数
-nominal_defect_rate = 0.10  # 标称次品率
-confidence_level_reject = 0.95  # 拒收的置信水平
-confidence_level_accept = 0.90  # 接收的置信水平
-precision = 0.05  # 允许的误差范围
-
-# 计算样本量
-sample_size = calculate_sample_size(confidence_level_reject, nominal_defect_rate, precision)
-print(f"计算的样本量: {sample_size}")
-
-# 验证不同真实次品率下的方案表现
-true_defect_rates = [0.08, 0.09, 0.10, 0.11, 0.12]
-
-for true_rate in true_defect_rates:
-    reject_rate, accept_rate = simulate_sampling_plan(true_rate, nominal_defect_rate, sample_size)
-    print(f"\n真实次品率: {true_rate:.2f}")
-    print(f"拒收率 (应 > 0.95 当真实率 > 标称率): {reject_rate:.4f}")
-    print(f"接收率 (应 > 0.90 当真实率 < 标称率): {accept_rate:.4f}")
-
-# 验证方案是否满足要求
-print("\n验证结果:")
-if simulate_sampling_plan(0.11, nominal_defect_rate, sample_size)[0] > 0.95:
-    print("通过: 95%置信度下正确拒收次品率超过标称值的情况")
-else:
-    print("未通过: 95%置信度下正确拒收次品率超过标称值的情况")
-
-if simulate_sampling_plan(0.09, nominal_defect_rate, sample_size)[1] > 0.90:
-    print("通过: 90%置信度下正确接收次品率不超过标称值的情况")
-else:
-    print("未通过: 90%置信度下正确接收次品率不超过标称值的情况")
\ No newline at end of file
+def exact_sampling_plan_rates(true_defect_rates, nominal_defect_rate, sample_size):
+    """
+    精确计算抽样检测方案的拒收率和接收率
+
+    与 simulate_sampling_plan 使用相同的单侧二项检验判据，但不做蒙特卡罗模拟：
+    先求出每个不合格品数对应的 p 值，再按真实次品率下的二项分布概率加权求和
+    true_defect_rates 可以是数组，返回与之形状相同的 (拒收率, 接收率)
+    """
+    true_defect_rates = np.asarray(true_defect_rates, dtype=float)
+    defects = np.arange(sample_size + 1)
+    # binomtest(alternative='greater') 的 p 值为 P(X >= x)
+    p_values = stats.binom.sf(defects - 1, sample_size, nominal_defect_rate)
+    
+    probabilities = stats.binom.pmf(defects, sample_size, true_defect_rates[..., None])
+    reject_rate = probabilities @ (p_values < 0.05)  # 95% 置信水平
+    accept_rate = probabilities @ (p_values > 0.10)  # 90% 置信水平
+    
+    return reject_rate, accept_rate
+
+# 主程序
+if __name__ == "__main__":
+    # 验证参数
+    nominal_defect_rate = 0.10  # 标称次品率
+    confidence_level_reject = 0.95  # 拒收的置信水平
+    confidence_level_accept = 0.90  # 接收的置信水平
+    precision = 0.05  # 允许的误差范围
+
+    # 计算样本量
+    sample_size = calculate_sample_size(confidence_level_reject, nominal_defect_rate, precision)
+    print(f"计算的样本量: {sample_size}")
+
+    # 验证不同真实次品率下的方案表现
+    true_defect_rates = [0.08, 0.09, 0.10, 0.11, 0.12]
+
+    reject_rates, accept_rates = exact_sampling_plan_rates(true_defect_rates, nominal_defect_rate, sample_size)
+    for true_rate, reject_rate, accept_rate in zip(true_defect_rates, reject_rates, accept_rates):
+        print(f"\n真实次品率: {true_rate:.2f}")
+        print(f"拒收率 (应 > 0.95 当真实率 > 标称率): {reject_rate:.4f}")
+        print(f"接收率 (应 > 0.90 当真实率 < 标称率): {accept_rate:.4f}")
+
+    # 验证方案是否满足要求
+    print("\n验证结果:")
+    if exact_sampling_plan_rates(0.11, nominal_defect_rate, sample_size)[0] > 0.95:
+        print("通过: 95%置信度下正确拒收次品率超过标称值的情况")
+    else:
+        print("未通过: 95%置信度下正确拒收次品率超过标称值的情况")
+
+    if exact_sampling_plan_rates(0.09, nominal_defect_rate, sample_size)[1] > 0.90:
+        print("通过: 90%置信度下正确接收次品率不超过标称值的情况")
+    else:
+        print("未通过: 90%置信度下正确接收次品率不超过标称值的情况")
@@ -1,8 +1,16 @@
 import math
+import json
+import functools
 import numpy as np
 import scipy.stats as stats
 import matplotlib.pyplot as plt
 import os
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，保存方案表时不加锁
+    fcntl = None
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
@@ -17,9 +25,9 @@ def binomial_test(n, x, p, alternative='greater'):
     result = stats.binomtest(x, n, p, alternative=alternative)
     return result.pvalue
 
-def design_sampling_plan(nominal_defect_rate, confidence_level_reject=0.95, confidence_level_accept=0.90):
-    sample_size_reject = calculate_sample_size(confidence_level_reject, nominal_defect_rate, 0.05)
-    sample_size_accept = calculate_sample_size(confidence_level_accept, nominal_defect_rate, 0.05)
+def design_sampling_plan(nominal_defect_rate, confidence_level_reject=0.95, confidence_level_accept=0.90, precision=0.05):
+    sample_size_reject = calculate_sample_size(confidence_level_reject, nominal_defect_rate, precision)
+    sample_size_accept = calculate_sample_size(confidence_level_accept, nominal_defect_rate, precision)
     sample_size = max(sample_size_reject, sample_size_accept)
     
     reject_limit = math.ceil(stats.binom.ppf(confidence_level_reject, sample_size, nominal_defect_rate))
@@ -34,6 +42,94 @@ def design_sampling_plan(nominal_defect_rate, confidence_level_reject=0.95, conf
         "confidence_level_accept": confidence_level_accept
     }
 
+@functools.lru_cache(maxsize=1024)
+def _cached_sampling_plan(nominal_defect_rate, confidence_level_reject, confidence_level_accept, precision):
+    return design_sampling_plan(nominal_defect_rate, confidence_level_reject, confidence_level_accept, precision)
+
+# 已加载的磁盘方案表，键为文件路径
+_plan_tables = {}
+
+def _read_plan_file(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_plan_table(cache_path, refresh=False):
+    """
+    读取磁盘上的抽样方案表（JSON），同一路径在进程内只读取一次
+
+    refresh=True 时重新读取文件，把其他进程新写入的方案合并到进程内的表中
+    """
+    if cache_path not in _plan_tables:
+        _plan_tables[cache_path] = _read_plan_file(cache_path)
+    elif refresh:
+        _plan_tables[cache_path].update(_read_plan_file(cache_path))
+    return _plan_tables[cache_path]
+
+@contextlib.contextmanager
+def _plan_file_lock(cache_path):
+    """
+    对方案表加进程间排他锁，使读取合并与替换之间不被其他进程的保存打断
+
+    锁加在旁边的 <cache_path>.lock 文件上（方案表本身会被 os.replace 替换，不能持有它的锁），释放前删除该文件；
+    等待中的进程拿到锁后若发现锁文件已被删除或换成新文件，就重新打开再加锁
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = cache_path + '.lock'
+    while True:
+        lock_file = open(lock_path, 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                break
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+        lock_file.close()
+
+def save_plan_table(cache_path):
+    """
+    将抽样方案表写回磁盘，先写临时文件再替换，避免留下不完整的文件
+
+    写入前重新读取文件并合并其他进程已写入的方案，临时文件名带进程号，多个进程同时保存时互不覆盖
+    """
+    with _plan_file_lock(cache_path):
+        table = load_plan_table(cache_path, refresh=True)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, cache_path)
+
+def get_sampling_plan(nominal_defect_rate, confidence_level_reject=0.95, confidence_level_accept=0.90, precision=0.05,
+                      cache_path=None):
+    """
+    带缓存的 design_sampling_plan
+
+    以 (标称次品率, 拒收信度, 接收信度, 精度) 为键，进程内使用 LRU 缓存；
+    给定 cache_path 时同时查找并更新磁盘上的方案表，供多次运行复用
+    返回方案的副本，修改返回值不会影响缓存
+    """
+    key = (float(nominal_defect_rate), float(confidence_level_reject), float(confidence_level_accept), float(precision))
+    if cache_path is None:
+        return dict(_cached_sampling_plan(*key))
+    
+    table = load_plan_table(cache_path)
+    table_key = ','.join(repr(value) for value in key)
+    if table_key not in table:
+        # 其他进程可能已经算过该方案
+        table = load_plan_table(cache_path, refresh=True)
+    if table_key not in table:
+        table[table_key] = dict(_cached_sampling_plan(*key))
+        save_plan_table(cache_path)
+    return dict(table[table_key])
+
 def execute_sampling_plan(plan, actual_defects):
     p_value_reject = binomial_test(plan["sample_size"], actual_defects, plan["nominal_defect_rate"], alternative='greater')
     p_value_accept = binomial_test(plan["sample_size"], actual_defects, plan["nominal_defect_rate"], alternative='less')
@@ -52,6 +148,139 @@ def execute_sampling_plan(plan, actual_defects):
         "actual_defects": actual_defects
     }
 
+def calculate_oc_curve(plan, true_defect_rates):
+    """
+    计算抽样方案的精确操作特性（OC）曲线
+
+    对一组真实次品率，用二项分布的累积分布函数一次性算出接收、拒收、需要进一步检验的概率
+    """
+    true_defect_rates = np.asarray(true_defect_rates, dtype=float)
+    accept_probability = stats.binom.cdf(plan['accept_limit'], plan['sample_size'], true_defect_rates)
+    reject_probability = stats.binom.sf(plan['reject_limit'], plan['sample_size'], true_defect_rates)
+    return {
+        "true_defect_rates": true_defect_rates,
+        "accept_probability": accept_probability,
+        "reject_probability": reject_probability,
+        "further_inspection_probability": 1 - accept_probability - reject_probability
+    }
+
+def design_sequential_plan(nominal_defect_rate, confidence_level_reject=0.95, confidence_level_accept=0.90, precision=0.05,
+                           max_units=None):
+    """
+    设计 Wald 序贯概率比检验（SPRT）方案，使其在 p0、p1 两点与同参数的固定样本量方案有相同的操作特性
+
+    先用 get_sampling_plan 得到固定方案，取固定方案以 confidence_level_reject 的概率接收时的次品率为原假设 p0，
+    以 confidence_level_accept 的概率拒收时的次品率为备择假设 p1；SPRT 在 p0 下误拒收的概率为 1 - confidence_level_reject，
+    在 p1 下误接收的概率为 1 - confidence_level_accept，即在这两点与固定方案有相同的接收/拒收概率。
+    若直接取 p1 = 标称次品率 + precision，两个假设相距过近，平均样本数反而超过固定方案的样本量。
+    SPRT 只区分 p0 与 p1，不能直接替代固定方案：固定方案在 p0 与 p1 之间多半给出"需要进一步检验"，
+    SPRT 则总会给出接收或拒收（标称次品率 10% 时约一半批次被接收，固定方案只接收约 10%）；
+    平均样本数只在 p0、p1 两点与固定方案的样本量比较，其余次品率下不保证更少
+    max_units: 最多检验的件数，达到后仍未越过边界则需要进一步检验；None 表示取固定方案的样本量
+    """
+    from scipy.optimize import brentq
+    plan = get_sampling_plan(nominal_defect_rate, confidence_level_reject, confidence_level_accept, precision)
+    sample_size = plan["sample_size"]
+    p0 = brentq(lambda p: stats.binom.cdf(plan["accept_limit"], sample_size, p) - confidence_level_reject, 0, 1)
+    p1 = brentq(lambda p: stats.binom.sf(plan["reject_limit"], sample_size, p) - confidence_level_accept, 0, 1)
+    alpha = 1 - confidence_level_reject
+    beta = 1 - confidence_level_accept
+    
+    return {
+        "p0": p0,
+        "p1": p1,
+        "defect_log_ratio": math.log(p1 / p0),  # 每件不合格品对对数似然比的贡献
+        "good_log_ratio": math.log((1 - p1) / (1 - p0)),  # 每件合格品对对数似然比的贡献
+        "reject_bound": math.log((1 - beta) / alpha),
+        "accept_bound": math.log(beta / (1 - alpha)),
+        "max_units": sample_size if max_units is None else max_units,
+        "fixed_sample_size": sample_size,
+        "nominal_defect_rate": nominal_defect_rate,
+        "confidence_level_reject": confidence_level_reject,
+        "confidence_level_accept": confidence_level_accept
+    }
+
+def execute_sequential_plan(sequential_plan, inspection_results):
+    """
+    逐件执行序贯检验
+
+    inspection_results: 可迭代对象，每个元素表示一件是否为不合格品；
+    一旦对数似然比越过拒收或接收边界即停止，不再读取后续结果
+    """
+    units_inspected = 0
+    defects = 0
+    decision = "需要进一步检验"
+    
+    for is_defective in inspection_results:
+        units_inspected += 1
+        defects += bool(is_defective)
+        log_ratio = (defects * sequential_plan["defect_log_ratio"]
+                     + (units_inspected - defects) * sequential_plan["good_log_ratio"])
+        if log_ratio >= sequential_plan["reject_bound"]:
+            decision = "拒收"
+            break
+        if log_ratio <= sequential_plan["accept_bound"]:
+            decision = "接收"
+            break
+        if sequential_plan["max_units"] is not None and units_inspected >= sequential_plan["max_units"]:
+            break
+    
+    return {
+        "decision": decision,
+        "units_inspected": units_inspected,
+        "actual_defects": defects
+    }
+
+def calculate_asn_curve(sequential_plan, true_defect_rates, num_iterations=100):
+    """
+    按 Wald 近似向量化计算序贯检验的接收概率（OC）和平均样本数（ASN）
+
+    对每个真实次品率 p 求方程 p*exp(a*h) + (1-p)*exp(b*h) = 1 的非零根 h（向量化牛顿迭代），
+    再由 h 得到接收概率 L(p) 与 ASN(p)
+    """
+    p = np.asarray(true_defect_rates, dtype=float)
+    a = sequential_plan["defect_log_ratio"]
+    b = sequential_plan["good_log_ratio"]
+    upper = sequential_plan["reject_bound"]
+    lower = sequential_plan["accept_bound"]
+    
+    drift = p * a + (1 - p) * b  # 每检验一件，对数似然比的期望增量
+    interior = (p > 0) & (p < 1)
+    p_safe = np.where(interior, p, 0.5)
+    
+    # 从根的外侧出发，凸函数上的牛顿迭代单调收敛到非零根
+    with np.errstate(divide='ignore'):
+        h = np.where(drift < 0, -np.log(p_safe) / a, -np.log1p(-p_safe) / b)
+    for _ in range(num_iterations):
+        exp_a = np.exp(a * h)
+        exp_b = np.exp(b * h)
+        value = p_safe * exp_a + (1 - p_safe) * exp_b - 1
+        slope = p_safe * a * exp_a + (1 - p_safe) * b * exp_b
+        h = h - value / slope
+    
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        accept_probability = np.where(
+            h > 0,
+            -np.expm1(-h * upper) / -np.expm1(h * (lower - upper)),
+            (np.exp(h * (upper - lower)) - np.exp(-h * lower)) / np.expm1(h * (upper - lower))
+        )
+        asn = (accept_probability * lower + (1 - accept_probability) * upper) / drift
+    
+    # 期望增量为零时取极限
+    balanced = np.abs(h) < 1e-8
+    accept_probability = np.where(balanced, upper / (upper - lower), accept_probability)
+    asn = np.where(balanced, -lower * upper / (p * a**2 + (1 - p) * b**2), asn)
+    
+    # 次品率为 0 或 1 时对数似然比每步变化确定
+    accept_probability = np.where(p <= 0, 1.0, np.where(p >= 1, 0.0, accept_probability))
+    asn = np.where(p <= 0, lower / b, np.where(p >= 1, upper / a, asn))
+    
+    return {
+        "true_defect_rates": p,
+        "accept_probability": accept_probability,
+        "average_sample_number": asn
+    }
+
 def plot_sample_size_vs_confidence(defect_rate, precision):
     confidence_levels = np.linspace(0.5, 0.99, 100)
     sample_sizes = [calculate_sample_size(cl, defect_rate, precision) for cl in confidence_levels]
@@ -101,20 +330,34 @@ def plot_decision_boundaries(plan):
     plt.savefig('./1/decision_boundaries.png', dpi=300)
     plt.close()
 
-def plot_decision_regions(plan):
-    defect_rates = np.linspace(0, 0.3, 100)
+def calculate_decision_matrix(plan, defect_rates, defect_counts):
+    """
+    用广播一次性计算决策区域矩阵 (0:接收, 1:进一步检验, 2:拒收)
+
+    决策只取决于不合格品数量，因此先按列求出决策再广播到每个次品率
+    """
+    defect_counts = np.asarray(defect_counts)
+    decisions = np.where(defect_counts > plan['reject_limit'], 2,
+                         np.where(defect_counts <= plan['accept_limit'], 0, 1))
+    return np.broadcast_to(decisions, (len(defect_rates), len(defect_counts)))
+
+def calculate_p_value_matrix(plan, defect_rates, defect_counts, alternative='greater'):
+    """
+    向量化计算每个 (次品率, 不合格品数量) 组合的单侧二项检验 p 值
+
+    与 binomial_test 结果相同：'greater' 为 P(X >= x)，'less' 为 P(X <= x)
+    """
+    defect_rates = np.asarray(defect_rates, dtype=float)[:, None]
+    defect_counts = np.asarray(defect_counts)[None, :]
+    if alternative == 'greater':
+        return stats.binom.sf(defect_counts - 1, plan['sample_size'], defect_rates)
+    return stats.binom.cdf(defect_counts, plan['sample_size'], defect_rates)
+
+def plot_decision_regions(plan, num_rates=100, show_p_values=False):
+    defect_rates = np.linspace(0, 0.3, num_rates)
     sample_sizes = np.arange(0, plan['sample_size'] + 1)
     
-    decision_matrix = np.zeros((len(defect_rates), len(sample_sizes)))
-    for i, rate in enumerate(defect_rates):
-        for j, size in enumerate(sample_sizes):
-            p_value = binomial_test(plan['sample_size'], size, rate)
-            if size > plan['reject_limit']:
-                decision_matrix[i, j] = 2  # 拒收
-            elif size <= plan['accept_limit']:
-                decision_matrix[i, j] = 0  # 接收
-            else:
-                decision_matrix[i, j] = 1  # 进一步检验
+    decision_matrix = calculate_decision_matrix(plan, defect_rates, sample_sizes)
     
     plt.figure(figsize=(12, 8))
     plt.imshow(decision_matrix, aspect='auto', extent=[0, plan['sample_size'], 0.3, 0], cmap='RdYlGn')
@@ -123,17 +366,52 @@ def plot_decision_regions(plan):
     plt.xlabel('不合格品数量')
     plt.ylabel('实际次品率')
     plt.axhline(plan['nominal_defect_rate'], color='k', linestyle='--', label='标称次品率')
+    if show_p_values:
+        p_values = calculate_p_value_matrix(plan, defect_rates, sample_sizes)
+        contours = plt.contour(sample_sizes, defect_rates, p_values, levels=[0.05, 0.10], colors='k', linewidths=0.8)
+        plt.clabel(contours, fmt='p=%.2f')
     plt.legend()
     plt.savefig('./1/decision_regions.png')
     plt.close()
 
+def plot_oc_curve(plan):
+    oc_curve = calculate_oc_curve(plan, np.linspace(0, 0.3, 3001))
+    
+    plt.figure(figsize=(10, 6))
+    plt.plot(oc_curve['true_defect_rates'], oc_curve['accept_probability'], color='g', label='接收概率')
+    plt.plot(oc_curve['true_defect_rates'], oc_curve['reject_probability'], color='r', label='拒收概率')
+    plt.plot(oc_curve['true_defect_rates'], oc_curve['further_inspection_probability'], color='y', label='进一步检验概率')
+    plt.axvline(plan['nominal_defect_rate'], color='k', linestyle='--', label='标称次品率')
+    plt.title('抽样方案的操作特性曲线')
+    plt.xlabel('实际次品率')
+    plt.ylabel('概率')
+    plt.grid(True)
+    plt.legend()
+    plt.savefig('./1/oc_curve.png', dpi=300)
+    plt.close()
+
+def plot_asn_curve(plan, sequential_plan):
+    asn_curve = calculate_asn_curve(sequential_plan, np.linspace(0, 0.3, 3001))
+    
+    plt.figure(figsize=(10, 6))
+    plt.plot(asn_curve['true_defect_rates'], asn_curve['average_sample_number'], label='序贯检验平均样本数')
+    plt.axhline(plan['sample_size'], color='r', linestyle='--', label='固定样本量')
+    plt.axvline(plan['nominal_defect_rate'], color='k', linestyle='--', label='标称次品率')
+    plt.title('序贯检验的平均样本数曲线')
+    plt.xlabel('实际次品率')
+    plt.ylabel('平均样本数')
+    plt.grid(True)
+    plt.legend()
+    plt.savefig('./1/asn_curve.png', dpi=300)
+    plt.close()
+
 # 主程序
 if __name__ == "__main__":
     # 创建保存图片的文件夹
     os.makedirs('./1', exist_ok=True)
 
     nominal_defect_rate = 0.10  # 10%的标称次品率
-    plan = design_sampling_plan(nominal_defect_rate)
+    plan = get_sampling_plan(nominal_defect_rate)
     print("抽样检测方案:")
     print(f"样本量: {plan['sample_size']}")
     print(f"拒收界限 (95% 信度): {plan['reject_limit']}")
@@ -144,6 +422,7 @@ if __name__ == "__main__":
     plot_sample_size_vs_confidence(nominal_defect_rate, 0.05)
     plot_decision_boundaries(plan)
     plot_decision_regions(plan)
+    plot_oc_curve(plan)
     
     print("\n情况1: 95% 信度下拒收")
     actual_defects_reject = plan['reject_limit'] + 1
@@ -157,4 +436,24 @@ if __name__ == "__main__":
     result_accept = execute_sampling_plan(plan, actual_defects_accept)
     print(f"实际不合格品数: {result_accept['actual_defects']}")
     print(f"决策: {result_accept['decision']}")
-    print(f"接收 p 值: {result_accept['p_value_accept']:.4f}")
\ No newline at end of file
+    print(f"接收 p 值: {result_accept['p_value_accept']:.4f}")
+    
+    print("\n序贯检验方案 (SPRT):")
+    sequential_plan = design_sequential_plan(nominal_defect_rate)
+    print(f"p0: {sequential_plan['p0']:.2%}, p1: {sequential_plan['p1']:.2%}")
+    rates = [sequential_plan['p0'], nominal_defect_rate, sequential_plan['p1']]
+    asn_curve = calculate_asn_curve(sequential_plan, rates)
+    fixed_oc = calculate_oc_curve(plan, rates)
+    for rate, accept, fixed_accept, fixed_reject, asn in zip(rates, asn_curve['accept_probability'],
+                                                             fixed_oc['accept_probability'], fixed_oc['reject_probability'],
+                                                             asn_curve['average_sample_number']):
+        print(f"真实次品率 {rate:.2%}: 接收概率 {accept:.4f} (固定方案接收 {fixed_accept:.4f}, 拒收 {fixed_reject:.4f}), "
+              f"平均样本数 {asn:.1f} (固定方案: {plan['sample_size']})")
+    if all(asn < plan['sample_size'] for asn in asn_curve['average_sample_number'][[0, 2]]):
+        print("通过: p0 和 p1 处序贯检验的平均样本数小于固定样本量")
+    else:
+        print("未通过: p0 或 p1 处序贯检验的平均样本数不小于固定样本量")
+    print("注意: 序贯检验只在 p0 和 p1 两点与固定方案的接收/拒收概率一致，回答的是次品率更接近 p0 还是 p1；"
+          f"标称次品率 {nominal_defect_rate:.2%} 下序贯检验接收 {asn_curve['accept_probability'][1]:.2%} 的批次，"
+          f"固定方案只接收 {fixed_oc['accept_probability'][1]:.2%}，其余多为需要进一步检验，因此不能直接替代固定方案")
+    plot_asn_curve(plan, sequential_plan)
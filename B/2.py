@@ -1,10 +1,18 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import os
+import csv
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+import separability
+
+def _pyplot():
+    """延迟导入 matplotlib：只有绘图时才加载绘图库，并设置中文字体"""
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+    return plt
 
 def calculate_cost(params, decisions):
     """
@@ -73,6 +81,40 @@ def optimize_decisions(params):
     
     return best_decisions, best_cost
 
+DECISION_NAMES = ['inspect_part1', 'inspect_part2', 'inspect_product', 'disassemble_defects']
+
+def decision_terms(params):
+    """
+    将总成本分解为常数项与各决策的独立项
+
+    返回 (常数项, {决策名: (选择是时的成本, 选择否时的成本)})；
+    市场调换损失只取决于是否检测成品，因此并入 inspect_product 一项
+    """
+    defect_rate = params['product_defect_rate']
+    constant = params['assembly_cost']
+    terms = {
+        'inspect_part1': (params['part1_cost'] + params['part1_inspect_cost'], params['part1_cost']),
+        'inspect_part2': (params['part2_cost'] + params['part2_inspect_cost'], params['part2_cost']),
+        'inspect_product': (params['product_inspect_cost'], defect_rate * params['replacement_cost']),
+        'disassemble_defects': (
+            defect_rate * params['disassemble_cost'],
+            defect_rate * (params['part1_cost'] + params['part2_cost'] + params['assembly_cost'])
+        )
+    }
+    return constant, terms
+
+def is_separable(params):
+    """
+    检查 decision_terms 的分解结果与 calculate_cost 是否一致（见 separability.is_separable）
+
+    决策之间存在交叉项或 decision_terms 与 calculate_cost 不一致时返回 False
+    """
+    constant, terms = decision_terms(params)
+    return separability.is_separable(
+        lambda matrix: [calculate_cost(params, {name: bool(flag) for name, flag in zip(DECISION_NAMES, flags)})
+                        for flags in matrix],
+        constant, [terms[name][0] for name in DECISION_NAMES], [terms[name][1] for name in DECISION_NAMES])
+
 def analyze_situation(situation):
     """
     分析给定情况并返回最优决策
@@ -98,6 +140,223 @@ def analyze_situation(situation):
     
     return best_decisions, best_cost
 
+def to_production_line(params, decisions):
+    """
+    把本题的参数和决策转换为 3.py 中 simulate_production_line 使用的多道工序形式（单道工序，两个零配件）
+
+    本题没有单独的市场损失参数，不合格成品流入市场时每件损失 replacement_cost，对应 3.py 的 market_price；
+    simulate_production_line 的 stage_inputs 取 [([0, 1], [])]。
+    本题的 calculate_cost 与 3.py 的公式不同：不计零配件次品率，且成品不检测时也计入不合格品的拆解或报废成本，
+    因此模拟结果只能与本题的公式成本对照（作为 formula_cost 传入）
+    返回 (工序参数, 工序决策)
+    """
+    line_params = {
+        'component_defect_rates': [params['part1_defect_rate'], params['part2_defect_rate']],
+        'component_prices': [params['part1_cost'], params['part2_cost']],
+        'component_inspect_costs': [params['part1_inspect_cost'], params['part2_inspect_cost']],
+        'product_defect_rates': [params['product_defect_rate']],
+        'assembly_costs': [params['assembly_cost']],
+        'product_inspect_costs': [params['product_inspect_cost']],
+        'disassemble_costs': [params['disassemble_cost']],
+        'market_price': params['replacement_cost']
+    }
+    line_decisions = {
+        'component_inspections': (decisions['inspect_part1'], decisions['inspect_part2']),
+        'product_inspections': (decisions['inspect_product'],),
+        'product_disassembles': (decisions['disassemble_defects'],)
+    }
+    return line_params, line_decisions
+
+# 全部 16 种决策组合，顺序与 optimize_decisions 的枚举顺序一致
+DECISION_COMBINATIONS = np.array(list(itertools.product([True, False], repeat=len(DECISION_NAMES))))
+
+def decode_decision(code):
+    """将决策编码（DECISION_COMBINATIONS 中的行号）还原为决策字典"""
+    return {name: bool(flag) for name, flag in zip(DECISION_NAMES, DECISION_COMBINATIONS[code])}
+
+def analyze_situations_batch(scenarios, chunk_size=262144):
+    """
+    批量分析大量情况，一次向量化计算所有情况下全部 16 种决策组合的成本
+
+    scenarios: 结构化数组或 {字段名: 数组} 形式的列数据，字段与 situations 中的字典相同
+    chunk_size: 每次计算的情况数，控制 (情况数 x 16) 成本矩阵占用的内存
+    返回 (decision_codes, best_costs)，decision_codes 可用 decode_decision 还原；
+    累加顺序与 calculate_cost 相同，结果与逐个调用 analyze_situation 完全一致
+    """
+    columns = {name: np.asarray(scenarios[name], dtype=float) for name in [
+        'part1_cost', 'part1_inspect_cost', 'part2_cost', 'part2_inspect_cost', 'product_defect_rate',
+        'assembly_cost', 'product_inspect_cost', 'replacement_cost', 'disassemble_cost'
+    ]}
+    num_scenarios = len(columns['part1_cost'])
+    inspect_part1, inspect_part2, inspect_product, disassemble_defects = DECISION_COMBINATIONS.T
+    
+    decision_codes = np.empty(num_scenarios, dtype=np.intp)
+    best_costs = np.empty(num_scenarios)
+    for start in range(0, num_scenarios, chunk_size):
+        chunk = {name: values[start:start + chunk_size, None] for name, values in columns.items()}
+        defect_rate = chunk['product_defect_rate']
+        
+        total_cost = np.where(inspect_part1, chunk['part1_cost'] + chunk['part1_inspect_cost'], chunk['part1_cost'])
+        total_cost = total_cost + np.where(inspect_part2, chunk['part2_cost'] + chunk['part2_inspect_cost'], chunk['part2_cost'])
+        total_cost = total_cost + chunk['assembly_cost']
+        total_cost = total_cost + np.where(inspect_product, chunk['product_inspect_cost'], 0)
+        total_cost = total_cost + np.where(
+            disassemble_defects,
+            defect_rate * chunk['disassemble_cost'],
+            defect_rate * (chunk['part1_cost'] + chunk['part2_cost'] + chunk['assembly_cost'])
+        )
+        total_cost = total_cost + np.where(inspect_product, 0, defect_rate * chunk['replacement_cost'])
+        
+        codes = np.argmin(total_cost, axis=1)
+        decision_codes[start:start + chunk_size] = codes
+        best_costs[start:start + chunk_size] = total_cost[np.arange(len(codes)), codes]
+    
+    return decision_codes, best_costs
+
+def iter_scenario_chunks(input_path, chunk_size=100000):
+    """
+    按块读取 CSV 或 JSONL（扩展名 .jsonl）情况文件
+
+    每次产出一块 {字段名: 取值列表} 形式的列数据，内存占用只与 chunk_size 有关
+    """
+    with open(input_path, newline='', encoding='utf-8') as f:
+        if input_path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield {name: [r[name] for r in chunk] for name in chunk[0]}
+                chunk = []
+        if chunk:
+            yield {name: [r[name] for r in chunk] for name in chunk[0]}
+
+def run_scenario_file(input_path, output_path, chunk_size=100000):
+    """
+    流式处理情况文件：逐块读取、用 analyze_situations_batch 求最优决策，并逐块写出结果
+
+    输出格式由 output_path 的扩展名决定（.jsonl 为 JSONL，否则为 CSV），
+    每行包含情况序号、各项决策和最低成本；返回处理的情况总数
+    """
+    fieldnames = ['scenario'] + DECISION_NAMES + ['best_cost']
+    num_processed = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        if not output_path.endswith('.jsonl'):
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+        
+        for chunk in iter_scenario_chunks(input_path, chunk_size):
+            decision_codes, best_costs = analyze_situations_batch(chunk, chunk_size=chunk_size)
+            for code, cost in zip(decision_codes, best_costs):
+                row = dict(scenario=num_processed, **decode_decision(code), best_cost=float(cost))
+                if writer is None:
+                    f.write(json.dumps(row) + '\n')
+                else:
+                    writer.writerow(row)
+                num_processed += 1
+            f.flush()
+    
+    return num_processed
+
+def _evaluate_sweep_point(situation):
+    best_decisions, best_cost = analyze_situation(situation)
+    return best_cost, [best_decisions[name] for name in DECISION_NAMES]
+
+def run_sensitivity_sweep(base_situation, grid, processes=None):
+    """
+    多参数敏感性分析：对 grid 中所有参数取值的笛卡尔积逐点求最优决策
+
+    base_situation: 基准情况，不会被修改
+    grid: {参数名: 取值序列}
+    processes: 进程池大小，None 为 CPU 核数，1 表示在当前进程串行计算
+    返回结构化数组，每行一个网格点，字段为各参数取值、best_cost 和各决策
+    """
+    param_names = list(grid)
+    points = list(itertools.product(*(grid[name] for name in param_names)))
+    # 每个网格点使用独立的参数字典，进程之间没有共享的可变状态
+    point_situations = [dict(base_situation, **dict(zip(param_names, point))) for point in points]
+    
+    if processes == 1:
+        results = list(map(_evaluate_sweep_point, point_situations))
+    else:
+        workers = processes or os.cpu_count() or 1
+        chunksize = max(1, len(points) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_evaluate_sweep_point, point_situations, chunksize=chunksize))
+    
+    dtype = [(name, float) for name in param_names] + [('best_cost', float)] + [(name, bool) for name in DECISION_NAMES]
+    sweep = np.zeros(len(points), dtype=dtype)
+    for name, values in zip(param_names, zip(*points)):
+        sweep[name] = values
+    sweep['best_cost'] = [cost for cost, _ in results]
+    for i, name in enumerate(DECISION_NAMES):
+        sweep[name] = [flags[i] for _, flags in results]
+    
+    return sweep
+
+def _affine_coefficients(term):
+    """把 decision_terms 中的一项（常数或关于参数的一次多项式）化为 (截距, 斜率)"""
+    from numpy.polynomial import Polynomial
+    if not isinstance(term, Polynomial):
+        return float(term), 0.0
+    if term.degree() > 1:
+        raise ValueError("成本不是该参数的一次函数，无法精确求断点")
+    coefficients = np.pad(term.coef, (0, 2))
+    return float(coefficients[0]), float(coefficients[1])
+
+def trace_breakpoints(situation, param_name, lower, upper):
+    """
+    精确计算单个参数在 [lower, upper] 上最优决策发生变化的断点
+
+    把该参数作为一次多项式代入 decision_terms，直接得到每个决策两种选择的成本直线的截距和斜率；
+    各决策相互独立，每对直线至多相交一次，交点即断点，无需密集网格，也没有差分带来的舍入误差
+    返回分段列表，每段为 {'start', 'end', 'decisions', 'intercept', 'slope'}，
+    段内最低成本为 intercept + slope * 参数取值，在断点处相邻两段的决策成本相同
+    """
+    from numpy.polynomial import Polynomial
+    if not is_separable(situation):
+        raise ValueError("成本不可逐项分解，无法精确求断点")
+    try:
+        constant, terms = decision_terms(dict(situation, **{param_name: Polynomial([0.0, 1.0])}))
+    except TypeError:
+        raise ValueError(f"成本不是 {param_name} 的一次函数，无法精确求断点")
+    constant_intercept, constant_slope = _affine_coefficients(constant)
+    lines = {name: (_affine_coefficients(terms[name][0]), _affine_coefficients(terms[name][1])) for name in DECISION_NAMES}
+
+    # 各决策两条直线的交点；相距在舍入误差以内的交点合并为同一个断点
+    scale = max(abs(lower), abs(upper), 1.0)
+    crossings = []
+    for (true_intercept, true_slope), (false_intercept, false_slope) in lines.values():
+        if true_slope != false_slope:
+            crossing = (false_intercept - true_intercept) / (true_slope - false_slope)
+            if lower < crossing < upper:
+                crossings.append(crossing)
+    breakpoints = []
+    for crossing in sorted(crossings):
+        if not breakpoints or crossing - breakpoints[-1] > 64 * np.finfo(float).eps * scale:
+            breakpoints.append(crossing)
+
+    segments = []
+    edges = [float(lower)] + breakpoints + [float(upper)]
+    for start, end in zip(edges[:-1], edges[1:]):
+        # 段内决策不变，按段中点取较小成本（相同时取"是"）
+        middle = (start + end) / 2
+        decisions = {}
+        intercept, slope = constant_intercept, constant_slope
+        for name, (true_line, false_line) in lines.items():
+            true_cost = true_line[0] + true_line[1] * middle
+            false_cost = false_line[0] + false_line[1] * middle
+            decisions[name] = bool(true_cost <= false_cost + 64 * np.finfo(float).eps * max(abs(true_cost), abs(false_cost)))
+            chosen_intercept, chosen_slope = true_line if decisions[name] else false_line
+            intercept += chosen_intercept
+            slope += chosen_slope
+        segments.append({'start': start, 'end': end, 'decisions': decisions, 'intercept': intercept, 'slope': slope})
+    return segments
+
 # 完整的六种情况数据
 situations = [
     {
@@ -138,22 +397,11 @@ situations = [
     }
 ]
 
-for i, situation in enumerate(situations, 1):
-    best_decisions, best_cost = analyze_situation(situation)
-    print(f"\n情况 {i}:")
-    print(f"最优决策: {best_decisions}")
-    print(f"最低成本: {best_cost:.2f}")
-    print("决策依据:")
-    print(f"  - {'检测' if best_decisions['inspect_part1'] else '不检测'}零配件1")
-    print(f"  - {'检测' if best_decisions['inspect_part2'] else '不检测'}零配件2")
-    print(f"  - {'检测' if best_decisions['inspect_product'] else '不检测'}成品")
-    print(f"  - {'拆解' if best_decisions['disassemble_defects'] else '不拆解'}不合格成品")
-
-
 def plot_optimal_decisions(situations, results):
     """
     绘制各情况下的最优决策比较图
     """
+    plt = _pyplot()
     decisions = ['inspect_part1', 'inspect_part2', 'inspect_product', 'disassemble_defects']
     decision_labels = ['检测零件1', '检测零件2', '检测成品', '拆解不合格品']
     
@@ -184,6 +432,7 @@ def plot_minimum_costs(situations, results):
     """
     绘制各情况下的最低成本比较图
     """
+    plt = _pyplot()
     costs = [result['best_cost'] for result in results]
     
     plt.figure(figsize=(10, 6))
@@ -204,6 +453,7 @@ def plot_sensitivity_analysis(situation, param_name, param_range):
     """
     绘制参数敏感性分析图
     """
+    plt = _pyplot()
     costs = []
     for value in param_range:
         temp_situation = situation.copy()
@@ -222,6 +472,31 @@ def plot_sensitivity_analysis(situation, param_name, param_range):
     plt.savefig(f'./2/sensitivity_{param_name}.png', dpi=300)
     plt.close()
 
+def plot_breakpoint_analysis(situation, param_name, lower, upper):
+    """
+    绘制精确的最低成本曲线及最优决策发生变化的断点
+    """
+    plt = _pyplot()
+    segments = trace_breakpoints(situation, param_name, lower, upper)
+    
+    plt.figure(figsize=(10, 6))
+    for segment in segments:
+        x = np.array([segment['start'], segment['end']])
+        plt.plot(x, segment['intercept'] + segment['slope'] * x, color='b')
+    for segment in segments[1:]:
+        plt.axvline(segment['start'], color='r', linestyle='--')
+        plt.annotate(f"{segment['start']:.4g}", xy=(segment['start'], plt.ylim()[0]), color='r')
+    plt.xlabel(param_name)
+    plt.ylabel('成本')
+    plt.title(f'{param_name} 对成本的影响（精确断点）')
+    plt.grid(True)
+    
+    plt.tight_layout()
+    plt.savefig(f'./2/breakpoints_{param_name}.png', dpi=300)
+    plt.close()
+    
+    return segments
+
 # 主程序
 if __name__ == "__main__":
     # 创建保存图片的文件夹
@@ -252,4 +527,11 @@ if __name__ == "__main__":
     plot_sensitivity_analysis(base_situation, 'part1_defect_rate', np.linspace(0, 0.3, 30))
     plot_sensitivity_analysis(base_situation, 'part2_defect_rate', np.linspace(0, 0.3, 30))
     plot_sensitivity_analysis(base_situation, 'product_defect_rate', np.linspace(0, 0.3, 30))
-    plot_sensitivity_analysis(base_situation, 'replacement_cost', np.linspace(0, 20, 30))
\ No newline at end of file
+    plot_sensitivity_analysis(base_situation, 'replacement_cost', np.linspace(0, 20, 30))
+    
+    # 精确断点分析
+    for param_name, lower, upper in [('product_defect_rate', 0, 0.3), ('replacement_cost', 0, 60)]:
+        segments = plot_breakpoint_analysis(base_situation, param_name, lower, upper)
+        print(f"\n{param_name} 的最优决策断点:")
+        for segment in segments:
+            print(f"  [{segment['start']:.4f}, {segment['end']:.4f}]: {segment['decisions']}")
@@ -112,14 +112,11 @@ print("\n敏感性分析:")
 for param in ['component_defect_rates', 'component_prices', 'product_defect_rates', 'assembly_costs', 'replacement_cost']:
     if isinstance(params[param], list):
         for i in range(len(params[param])):
-            original_value = params[param][i]
-            params[param][i] *= 1.1  # 增加10%
-            new_decisions, new_cost = optimize_decisions(params)
+            # 在参数副本上修改，不改动共享的 params
+            values = list(params[param])
+            values[i] *= 1.1  # 增加10%
+            new_decisions, new_cost = optimize_decisions(dict(params, **{param: values}))
             print(f"{param}[{i}] 增加10%后的最优成本: {new_cost:.2f}")
-            params[param][i] = original_value  # 恢复原值
     else:
-        original_value = params[param]
-        params[param] *= 1.1  # 增加10%
-        new_decisions, new_cost = optimize_decisions(params)
-        print(f"{param} 增加10%后的最优成本: {new_cost:.2f}")
-        params[param] = original_value  # 恢复原值
\ No newline at end of file
+        new_decisions, new_cost = optimize_decisions(dict(params, **{param: params[param] * 1.1}))  # 增加10%
+        print(f"{param} 增加10%后的最优成本: {new_cost:.2f}")
\ No newline at end of file
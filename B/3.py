@@ -1,12 +1,18 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
 import os
+import csv
+import json
 import itertools
+import importlib.util
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+import separability
+
+def _pyplot():
+    """延迟导入 matplotlib：只有绘图时才加载绘图库，并设置中文字体"""
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+    return plt
 
 def calculate_cost(params, decisions):
     total_cost = 0
@@ -69,6 +75,517 @@ def optimize_decisions(params):
     
     return best_decisions, best_cost
 
+def build_decision_matrix(num_flags):
+    """
+    将全部决策组合编码为布尔矩阵
+
+    每行对应一种组合，行顺序与 optimize_decisions 中 itertools.product([True, False], ...) 的枚举顺序一致
+    """
+    rows = np.arange(2 ** num_flags)
+    shifts = np.arange(num_flags - 1, -1, -1)
+    return ((rows[:, None] >> shifts) & 1) == 0
+
+def calculate_costs_vectorized(params, decision_matrix):
+    """
+    批量计算决策矩阵中每一行的总成本
+
+    列依次为零配件检测、半成品/成品检测、半成品/成品拆解；
+    累加顺序与 calculate_cost 相同，因此结果与逐个计算完全一致
+    """
+    num_components = len(params['component_defect_rates'])
+    num_products = len(params['product_defect_rates'])
+    component_inspections = decision_matrix[:, :num_components]
+    product_inspections = decision_matrix[:, num_components:num_components + num_products]
+    product_disassembles = decision_matrix[:, num_components + num_products:]
+
+    total_cost = np.zeros(len(decision_matrix))
+
+    # 零配件成本
+    for i, (defect_rate, price, inspect_cost) in enumerate(zip(
+        params['component_defect_rates'],
+        params['component_prices'],
+        params['component_inspect_costs']
+    )):
+        total_cost += price
+        total_cost += np.where(component_inspections[:, i], inspect_cost, defect_rate * price)
+
+    # 半成品和成品成本
+    scrap_value = sum(params['component_prices'])
+    for i, (defect_rate, assembly_cost, inspect_cost, disassemble_cost) in enumerate(zip(
+        params['product_defect_rates'],
+        params['assembly_costs'],
+        params['product_inspect_costs'],
+        params['disassemble_costs']
+    )):
+        total_cost += assembly_cost
+        total_cost += np.where(product_inspections[:, i], inspect_cost, 0)
+        total_cost += np.where(product_disassembles[:, i],
+                               defect_rate * disassemble_cost,
+                               defect_rate * (assembly_cost + scrap_value))
+
+    # 成品市场损失
+    total_cost += np.where(product_inspections[:, -1], 0, params['product_defect_rates'][-1] * params['market_price'])
+
+    return total_cost
+
+def optimize_decisions_vectorized(params):
+    """
+    optimize_decisions 的向量化版本，一次性计算全部 2^n 种组合的成本
+
+    返回的最优决策和成本与 optimize_decisions 相同（相同成本时取枚举顺序中的第一个）
+    """
+    num_components = len(params['component_defect_rates'])
+    num_products = len(params['product_defect_rates'])
+    decision_matrix = build_decision_matrix(num_components + 2 * num_products)
+    costs = calculate_costs_vectorized(params, decision_matrix)
+
+    best_index = int(np.argmin(costs))
+    best_row = [bool(flag) for flag in decision_matrix[best_index]]
+    best_decisions = {
+        'component_inspections': tuple(best_row[:num_components]),
+        'product_inspections': tuple(best_row[num_components:num_components + num_products]),
+        'product_disassembles': tuple(best_row[num_components + num_products:])
+    }
+    return best_decisions, float(costs[best_index])
+
+def decision_terms(params):
+    """
+    将总成本分解为常数项与各决策的独立项
+
+    返回 (常数项, 选择是时的成本数组, 选择否时的成本数组)，数组按
+    零配件检测、半成品/成品检测、半成品/成品拆解的顺序排列；
+    成品市场损失只取决于最后一道工序是否检测，因此并入该检测项
+    """
+    component_defect_rates = np.asarray(params['component_defect_rates'], dtype=float)
+    component_prices = np.asarray(params['component_prices'], dtype=float)
+    product_defect_rates = np.asarray(params['product_defect_rates'], dtype=float)
+    assembly_costs = np.asarray(params['assembly_costs'], dtype=float)
+
+    constant = component_prices.sum() + assembly_costs.sum()
+
+    market_loss = np.zeros(len(product_defect_rates))
+    market_loss[-1] = product_defect_rates[-1] * params['market_price']
+
+    cost_if_true = np.concatenate([
+        np.asarray(params['component_inspect_costs'], dtype=float),
+        np.asarray(params['product_inspect_costs'], dtype=float),
+        product_defect_rates * np.asarray(params['disassemble_costs'], dtype=float)
+    ])
+    cost_if_false = np.concatenate([
+        component_defect_rates * component_prices,
+        market_loss,
+        product_defect_rates * (assembly_costs + sum(params['component_prices']))
+    ])
+    return constant, cost_if_true, cost_if_false
+
+def _split_flags(params, flags):
+    """把按 decision_terms 顺序排列的决策向量拆成决策字典"""
+    num_components = len(params['component_defect_rates'])
+    num_products = len(params['product_defect_rates'])
+    flags = [bool(flag) for flag in flags]
+    return {
+        'component_inspections': tuple(flags[:num_components]),
+        'product_inspections': tuple(flags[num_components:num_components + num_products]),
+        'product_disassembles': tuple(flags[num_components + num_products:])
+    }
+
+def is_separable(params):
+    """
+    检查 decision_terms 的分解结果与 calculate_cost 是否一致（见 separability.is_separable）
+
+    决策之间存在交叉项或两者不一致时返回 False
+    """
+    constant, cost_if_true, cost_if_false = decision_terms(params)
+    return separability.is_separable(
+        lambda matrix: [calculate_cost(params, _split_flags(params, flags)) for flags in matrix],
+        constant, cost_if_true, cost_if_false)
+
+def optimize_decisions_separable(params):
+    """
+    利用成本的可加性逐项独立求解
+
+    逐项求解为 O(决策数)，另加 separability.is_separable 的检查，为 O(决策数²)；
+    决策数不超过 separability.BRUTE_FORCE_FLAGS 或分解不成立时退回到 optimize_decisions_vectorized 穷举
+    """
+    num_flags = len(params['component_defect_rates']) + 2 * len(params['product_defect_rates'])
+    if num_flags <= separability.BRUTE_FORCE_FLAGS or not is_separable(params):
+        return optimize_decisions_vectorized(params)
+    best_decisions = _split_flags(params, separability.separable_flags(*decision_terms(params)))
+    return best_decisions, calculate_cost(params, best_decisions)
+
+def _parse_params_row(row):
+    """CSV 中的列表参数以 JSON 字符串保存，其余为数值"""
+    params = {}
+    for name, value in row.items():
+        if isinstance(value, str):
+            value = json.loads(value) if value.lstrip().startswith('[') else float(value)
+        params[name] = value
+    return params
+
+def iter_scenario_chunks(input_path, chunk_size=10000):
+    """
+    按块读取 CSV 或 JSONL（扩展名 .jsonl）参数文件，每行为一组与 params 结构相同的参数
+
+    每次产出至多 chunk_size 个参数字典，内存占用只与 chunk_size 有关
+    """
+    with open(input_path, newline='', encoding='utf-8') as f:
+        if input_path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        
+        chunk = []
+        for row in rows:
+            chunk.append(_parse_params_row(row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def run_scenario_file(input_path, output_path, chunk_size=10000):
+    """
+    流式处理参数文件：逐块读取、用 optimize_decisions_separable 求最优决策，并逐块写出结果
+
+    输出格式由 output_path 的扩展名决定（.jsonl 为 JSONL，否则为 CSV，列表以 JSON 字符串保存），
+    每行包含情况序号、各项决策和最低成本；返回处理的情况总数
+    """
+    fieldnames = ['scenario', 'component_inspections', 'product_inspections', 'product_disassembles', 'best_cost']
+    num_processed = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        if not output_path.endswith('.jsonl'):
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+        
+        for chunk in iter_scenario_chunks(input_path, chunk_size):
+            for params in chunk:
+                best_decisions, best_cost = optimize_decisions_separable(params)
+                row = dict(scenario=num_processed, **best_decisions, best_cost=float(best_cost))
+                if writer is None:
+                    f.write(json.dumps(row) + '\n')
+                else:
+                    writer.writerow({name: json.dumps(value) if isinstance(value, tuple) else value
+                                     for name, value in row.items()})
+                num_processed += 1
+            f.flush()
+    
+    return num_processed
+
+def build_problem3_graph():
+    """
+    按题目表2构建装配图（物料清单 DAG）
+
+    边由子件指向父件，quantity 为每个父件所需的子件数量
+    """
+    import networkx as nx
+    graph = nx.DiGraph()
+    component_prices = [2, 8, 12, 2, 8, 12, 8, 12]
+    component_inspect_costs = [1, 1, 2, 1, 1, 2, 1, 2]
+    for i, (price, inspect_cost) in enumerate(zip(component_prices, component_inspect_costs), 1):
+        graph.add_node(f'零件{i}', kind='component', defect_rate=0.1, price=price, inspect_cost=inspect_cost)
+
+    for i in range(1, 4):
+        graph.add_node(f'半成品{i}', kind='assembly', defect_rate=0.1, assembly_cost=8, inspect_cost=4, disassemble_cost=6)
+    graph.add_node('成品', kind='assembly', defect_rate=0.1, assembly_cost=8, inspect_cost=6, disassemble_cost=10,
+                   market_price=200)
+
+    for component, semi in [(1, 1), (2, 1), (3, 1), (4, 2), (5, 2), (6, 2), (7, 3), (8, 3)]:
+        graph.add_edge(f'零件{component}', f'半成品{semi}', quantity=1)
+    for semi in range(1, 4):
+        graph.add_edge(f'半成品{semi}', '成品', quantity=1)
+
+    return graph
+
+def validate_assembly_graph(graph):
+    """检查装配图是否为 DAG 且每个节点都带有所需属性"""
+    import networkx as nx
+    if not nx.is_directed_acyclic_graph(graph):
+        raise ValueError("装配图中存在环")
+
+    required = {
+        'component': ('defect_rate', 'price', 'inspect_cost'),
+        'assembly': ('defect_rate', 'assembly_cost', 'inspect_cost', 'disassemble_cost')
+    }
+    for node, data in graph.nodes(data=True):
+        kind = data.get('kind')
+        if kind not in required:
+            raise ValueError(f"节点 {node} 的类型未知: {kind}")
+        missing = [key for key in required[kind] if key not in data]
+        if missing:
+            raise ValueError(f"节点 {node} 缺少属性: {missing}")
+        if kind == 'component' and graph.in_degree(node) > 0:
+            raise ValueError(f"零配件节点 {node} 不应有子件")
+        if kind == 'assembly' and graph.in_degree(node) == 0:
+            raise ValueError(f"装配节点 {node} 没有子件")
+
+    # 需求量以唯一的成品为 1 件计算
+    sinks = [node for node in graph.nodes if graph.out_degree(node) == 0]
+    if len(sinks) != 1:
+        raise ValueError(f"装配图必须有且只有一个成品节点，实际为: {sinks}")
+
+def calculate_graph_quantities(graph):
+    """
+    沿拓扑序动态规划计算每个节点的物料价值和需求量
+
+    物料价值：零配件为购买单价，半成品/成品为装配成本加上全部子件的物料价值；
+    需求量：每件成品所需该节点的数量，共用子件的需求量为各父件需求之和
+    """
+    import networkx as nx
+    order = list(nx.topological_sort(graph))
+
+    material_values = {}
+    for node in order:
+        data = graph.nodes[node]
+        if data['kind'] == 'component':
+            material_values[node] = data['price']
+        else:
+            material_values[node] = data['assembly_cost'] + sum(
+                edge.get('quantity', 1) * material_values[child]
+                for child, _, edge in graph.in_edges(node, data=True)
+            )
+
+    demands = {}
+    for node in reversed(order):
+        if graph.out_degree(node) == 0:
+            demands[node] = 1
+        else:
+            demands[node] = sum(
+                edge.get('quantity', 1) * demands[parent]
+                for _, parent, edge in graph.out_edges(node, data=True)
+            )
+
+    return material_values, demands
+
+def _node_decision_costs(data, material_value, is_final):
+    """返回单个节点每件的 (常数项, {决策名: (选择是时的成本, 选择否时的成本)})"""
+    defect_rate = data['defect_rate']
+    if data['kind'] == 'component':
+        return data['price'], {'inspect': (data['inspect_cost'], defect_rate * data['price'])}
+
+    market_loss = defect_rate * data.get('market_price', 0) if is_final else 0
+    return data['assembly_cost'], {
+        'inspect': (data['inspect_cost'], market_loss),
+        # 不拆解时损失装配成本和全部子件的物料价值
+        'disassemble': (defect_rate * data['disassemble_cost'], defect_rate * material_value)
+    }
+
+def calculate_graph_node_costs(graph, decisions):
+    """
+    计算装配图在给定决策下每个节点分摊到每件成品的成本
+
+    decisions: {节点: {'inspect': bool, 'disassemble': bool}}，零配件节点只需 'inspect'
+    返回 {节点: 需求量 × 单件节点成本}
+    """
+    material_values, demands = calculate_graph_quantities(graph)
+
+    node_costs = {}
+    for node, data in graph.nodes(data=True):
+        constant, terms = _node_decision_costs(data, material_values[node], graph.out_degree(node) == 0)
+        node_cost = constant
+        for name, (cost_if_true, cost_if_false) in terms.items():
+            node_cost += cost_if_true if decisions[node][name] else cost_if_false
+        node_costs[node] = demands[node] * node_cost
+
+    return node_costs
+
+def calculate_graph_cost(graph, decisions):
+    """计算装配图在给定决策下每件成品的总成本"""
+    return sum(calculate_graph_node_costs(graph, decisions).values())
+
+def optimize_graph_decisions(graph):
+    """
+    在装配图上求最优检测/拆解决策
+
+    先沿拓扑序动态规划求出各节点的物料价值与需求量，此后各节点的决策相互独立，
+    逐节点取较小成本即为全局最优（成本相同时取"是"），总复杂度与节点数和边数成线性；
+    与 calculate_cost 相同，次品率不沿边传递：每个节点只按自身次品率计成本，
+    子件的决策不改变父件的次品率
+    """
+    validate_assembly_graph(graph)
+    material_values, demands = calculate_graph_quantities(graph)
+
+    best_decisions = {}
+    best_cost = 0
+    for node, data in graph.nodes(data=True):
+        constant, terms = _node_decision_costs(data, material_values[node], graph.out_degree(node) == 0)
+        node_decisions = {}
+        node_cost = constant
+        for name, (cost_if_true, cost_if_false) in terms.items():
+            node_decisions[name] = cost_if_true <= cost_if_false
+            node_cost += min(cost_if_true, cost_if_false)
+        best_decisions[node] = node_decisions
+        best_cost += demands[node] * node_cost
+
+    return best_decisions, best_cost
+
+def check_flat_model_gap(graph, params, missing_nodes):
+    """
+    核对装配图模型与扁平模型 calculate_cost 的最优成本之差
+
+    missing_nodes: 装配图中有而扁平参数中没有的节点
+    两个模型都按节点独立计成本，差额应恰好等于这些节点在最优决策下的成本；扁平模型不拆解时按全部零配件价格计损失，装配图按该节点的物料价值计，
+    当这一差别影响最优决策时两者不再只差缺少的节点，此时抛出 ValueError
+    返回 (差额, 缺少节点的成本)
+    """
+    graph_decisions, graph_cost = optimize_graph_decisions(graph)
+    _, flat_cost = optimize_decisions_vectorized(params)
+    node_costs = calculate_graph_node_costs(graph, graph_decisions)
+    gap = graph_cost - flat_cost
+    missing_cost = sum(node_costs[node] for node in missing_nodes)
+    if not np.isclose(gap, missing_cost):
+        raise ValueError(f"装配图模型与扁平模型的差额 {gap} 不等于缺少节点的成本 {missing_cost}")
+    return gap, missing_cost
+
+# 扁平参数 params 各道工序的投入 (零配件序号, 上游工序序号)：半成品1 装配零件1-3，半成品2 装配零件4-6，
+# 成品装配零件7、8 和两个半成品（扁平参数中没有半成品3）
+PROBLEM3_STAGE_INPUTS = [([0, 1, 2], []), ([3, 4, 5], []), ([6, 7], [0, 1])]
+
+# 同样的零配件分组但工序串联：每道工序装配上一道工序的产出
+SERIAL_STAGE_INPUTS = [([0, 1, 2], []), ([3, 4, 5], [0]), ([6, 7], [1])]
+
+def _validate_stage_inputs(params, stage_inputs):
+    num_components = len(params['component_defect_rates'])
+    if len(stage_inputs) != len(params['product_defect_rates']):
+        raise ValueError("stage_inputs 的工序数与 product_defect_rates 不一致")
+    used_components = [i for components, _ in stage_inputs for i in components]
+    if sorted(used_components) != list(range(num_components)):
+        raise ValueError("每个零配件必须恰好进入一道工序")
+    used_stages = [j for _, stages in stage_inputs for j in stages]
+    if sorted(used_stages) != list(range(len(stage_inputs) - 1)):
+        raise ValueError("除最后一道工序外，每道工序的产出必须恰好进入一道工序")
+    for k, (_, stages) in enumerate(stage_inputs):
+        if any(j >= k for j in stages):
+            raise ValueError(f"工序 {k} 的上游工序必须排在它之前")
+    rates = list(params['component_defect_rates']) + list(params['product_defect_rates'])
+    if any(not 0 <= rate < 1 for rate in rates):
+        raise ValueError("次品率必须在 [0, 1) 内，次品率为 1 时检测后补购和返工都不会结束")
+
+def simulate_production_line(params, decisions, stage_inputs, num_units=1000000, chunk_size=100000, rng=None,
+                             formula_cost=None):
+    """
+    逐件模拟生产线的实际物料流，统计每件出厂成品实际发生的成本，并与 calculate_cost 的公式成本对照
+
+    stage_inputs: 每道工序的投入 (零配件序号列表, 上游工序序号列表)，上游工序必须排在前面，
+        最后一道工序为成品，如 PROBLEM3_STAGE_INPUTS、SERIAL_STAGE_INPUTS
+    - 零配件：检测时剔除次品并补购直到合格；不检测时次品直接进入装配
+    - 工序：任一投入不合格或装配本身出错（按该工序次品率）时产出不合格；
+      检测出不合格时，拆解则付出拆解费用、更换其中不合格的部件后重新装配（假定拆解时能辨别出不合格部件），
+      不拆解则报废全部投入并重新生产；不检测时不合格品流入下游工序
+    - 最后一道工序不检测时，不合格成品流入市场，每件造成 market_price 的损失
+    按 chunk_size 分块向量化计算，内存占用与 num_units 无关
+    rng: numpy.random.Generator，默认新建一个
+    formula_cost: 对照的公式成本，默认为 calculate_cost(params, decisions)；
+        用 2.py、4.py 的 to_production_line 转换得到的参数时传入该题 calculate_cost 的结果
+
+    公式成本是一阶近似，与模拟的差额来自以下假设，而非随机误差：
+    - 公式中每道工序的产出次品率就是该工序的次品率，不计未检测的不合格零配件和上游不合格品带入的次品，
+      而模拟中任一投入不合格则产出不合格，这是差额的主要来源；
+    - 公式对检出的不合格品只计一次拆解或报废，模拟中返工后的产出仍可能不合格，需要反复返工直到合格；
+    - 公式对未检测的零配件按 price * (1 + 次品率) 计成本（补购次品），模拟中不检测的次品直接进入装配
+    返回 {'num_units', 'mean_cost', 'std_error', 'formula_cost', 'gap', 'breakdown'}，
+    mean_cost 为每件出厂成品的平均成本，gap = mean_cost - formula_cost；
+    breakdown 为零配件（购买与检测）、装配与检测、拆解、市场损失各项的单件平均值
+    """
+    _validate_stage_inputs(params, stage_inputs)
+    if rng is None:
+        rng = np.random.default_rng()
+    component_rates = np.asarray(params['component_defect_rates'], dtype=float)
+    component_prices = np.asarray(params['component_prices'], dtype=float)
+    component_inspect_costs = np.asarray(params['component_inspect_costs'], dtype=float)
+    component_inspections = decisions['component_inspections']
+    product_rates = params['product_defect_rates']
+    num_stages = len(product_rates)
+    categories = ['components', 'assembly_and_inspection', 'disassembly', 'market_loss']
+
+    def buy_component(i, size, costs):
+        """购买 size 件零配件 i，费用记入 costs，返回各件是否为次品"""
+        if component_inspections[i]:
+            # 检测到合格为止所需的件数服从几何分布
+            draws = rng.geometric(1 - component_rates[i], size)
+            costs[:, 0] += draws * (component_prices[i] + component_inspect_costs[i])
+            return np.zeros(size, dtype=bool)
+        costs[:, 0] += component_prices[i]
+        return rng.random(size) < component_rates[i]
+
+    def produce_stage(k, size):
+        """生产 size 件第 k 道工序的产出，返回 (各件成本 [size, 4], 各件是否不合格)"""
+        stage_components, upstream_stages = stage_inputs[k]
+        costs = np.zeros((size, len(categories)))
+        inputs = [buy_component(i, size, costs) for i in stage_components]
+        for j in upstream_stages:
+            upstream_costs, upstream_defects = produce_stage(j, size)
+            costs += upstream_costs
+            inputs.append(upstream_defects)
+        inputs = np.column_stack(inputs)
+        defects = np.zeros(size, dtype=bool)
+
+        pending = np.arange(size)
+        while pending.size:
+            costs[pending, 1] += params['assembly_costs'][k]
+            defective = inputs[pending].any(axis=1) | (rng.random(pending.size) < product_rates[k])
+            if not decisions['product_inspections'][k]:
+                defects[pending] = defective
+                break
+            costs[pending, 1] += params['product_inspect_costs'][k]
+            pending = pending[defective]
+            if decisions['product_disassembles'][k]:
+                costs[pending, 2] += params['disassemble_costs'][k]
+                replace = inputs[pending]
+            else:
+                replace = np.ones((pending.size, inputs.shape[1]), dtype=bool)
+            # 重新准备需要更换的投入：零配件重新购买，上游工序的产出重新生产
+            for column in range(inputs.shape[1]):
+                units = pending[replace[:, column]]
+                if not units.size:
+                    continue
+                if column < len(stage_components):
+                    replacement_costs = np.zeros((units.size, len(categories)))
+                    inputs[units, column] = buy_component(stage_components[column], units.size, replacement_costs)
+                else:
+                    replacement_costs, inputs[units, column] = produce_stage(
+                        upstream_stages[column - len(stage_components)], units.size)
+                costs[units] += replacement_costs
+        return costs, defects
+
+    totals = np.zeros(len(categories))
+    mean_cost = 0.0
+    squared_deviations = 0.0
+    processed = 0
+    for start in range(0, num_units, chunk_size):
+        size = min(chunk_size, num_units - start)
+        chunk_costs, final_defects = produce_stage(num_stages - 1, size)
+        chunk_costs[:, 3] = final_defects * params['market_price']
+        unit_costs = chunk_costs.sum(axis=1)
+        totals += chunk_costs.sum(axis=0)
+
+        # 分块合并均值与离差平方和，避免大数相减损失精度
+        chunk_mean = unit_costs.mean()
+        delta = chunk_mean - mean_cost
+        squared_deviations += ((unit_costs - chunk_mean) ** 2).sum() + delta ** 2 * processed * size / (processed + size)
+        mean_cost += delta * size / (processed + size)
+        processed += size
+
+    std_error = np.sqrt(squared_deviations / (processed - 1) / processed) if processed > 1 else np.nan
+    if formula_cost is None:
+        formula_cost = calculate_cost(params, decisions)
+    return {
+        'num_units': processed,
+        'mean_cost': float(mean_cost),
+        'std_error': float(std_error),
+        'formula_cost': formula_cost,
+        'gap': float(mean_cost - formula_cost),
+        'breakdown': {name: float(total / processed) for name, total in zip(categories, totals)}
+    }
+
+def _load_script(filename):
+    """按文件路径导入同目录下的题目脚本（文件名以数字开头，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location(
+        'problem' + os.path.splitext(filename)[0], os.path.join(os.path.dirname(os.path.abspath(__file__)), filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 # 参数设置
 params = {
     'component_defect_rates': [0.1] * 8,
@@ -81,17 +598,9 @@ params = {
     'market_price': 200
 }
 
-best_decisions, best_cost = optimize_decisions(params)
-
-print("最优决策:")
-print("零配件检测:", best_decisions['component_inspections'])
-print("半成品/成品检测:", best_decisions['product_inspections'])
-print("半成品/成品拆解:", best_decisions['product_disassembles'])
-print("最低成本:", best_cost)
-
-
 def plot_component_decisions(best_decisions):
     """绘制零配件检测决策图"""
+    plt = _pyplot()
     decisions = best_decisions['component_inspections']
     component_names = [f'零件{i+1}' for i in range(len(decisions))]
     
@@ -106,6 +615,7 @@ def plot_component_decisions(best_decisions):
 
 def plot_product_decisions(best_decisions):
     """绘制半成品/成品检测和拆解决策图"""
+    plt = _pyplot()
     inspections = best_decisions['product_inspections']
     disassembles = best_decisions['product_disassembles']
     stages = ['半成品1', '半成品2', '成品']
@@ -127,10 +637,10 @@ def plot_product_decisions(best_decisions):
     plt.tight_layout()
     plt.savefig('./3/product_decisions.png', dpi=300)
     plt.close()
-import matplotlib.pyplot as plt
 
 def plot_cost_breakdown(params, best_decisions):
     """绘制成本构成图"""
+    plt = _pyplot()
     costs = {
         '零配件成本': 0,
         '检测成本': 0,
@@ -176,7 +686,7 @@ if __name__ == "__main__":
     # 创建保存图片的文件夹
     os.makedirs('./3', exist_ok=True)
     
-    best_decisions, best_cost = optimize_decisions(params)
+    best_decisions, best_cost = optimize_decisions_vectorized(params)
 
     print("最优决策:")
     print("零配件检测:", best_decisions['component_inspections'])
@@ -187,4 +697,47 @@ if __name__ == "__main__":
     # 生成可视化图表
     plot_component_decisions(best_decisions)
     plot_product_decisions(best_decisions)
-    plot_cost_breakdown(params, best_decisions)
\ No newline at end of file
+    plot_cost_breakdown(params, best_decisions)
+
+    # 装配图模型
+    graph_decisions, graph_cost = optimize_graph_decisions(build_problem3_graph())
+    print("\n装配图模型最优决策:")
+    for node, node_decisions in graph_decisions.items():
+        print(f"{node}: {node_decisions}")
+    print("装配图模型最低成本:", graph_cost)
+    # 扁平参数 params 只列出了半成品1、半成品2 和成品三道工序，题目表2中的半成品3 不在其中
+    missing_nodes = ['半成品3']
+    gap, missing_cost = check_flat_model_gap(build_problem3_graph(), params, missing_nodes)
+    print(f"与扁平模型的差额: {gap:.4f}，即扁平参数中缺少的{'、'.join(missing_nodes)}的成本 {missing_cost:.4f}")
+
+    # 逐件模拟实际物料流，与公式成本对照；另按串联工序模拟一次，分出工序结构造成的差额
+    simulation = simulate_production_line(params, best_decisions, PROBLEM3_STAGE_INPUTS, num_units=1000000,
+                                          rng=np.random.default_rng(2024))
+    serial_simulation = simulate_production_line(params, best_decisions, SERIAL_STAGE_INPUTS, num_units=1000000,
+                                                 rng=np.random.default_rng(2024))
+    print(f"\n逐件模拟 {simulation['num_units']} 件成品的实际平均成本: {simulation['mean_cost']:.4f} ± {simulation['std_error']:.4f}")
+    print(f"公式成本: {simulation['formula_cost']:.4f}，差额: {simulation['gap']:.4f}")
+    print("实际成本构成:", {name: round(value, 4) for name, value in simulation['breakdown'].items()})
+    print(f"串联工序的实际平均成本: {serial_simulation['mean_cost']:.4f} ± {serial_simulation['std_error']:.4f}，"
+          f"其中 {serial_simulation['mean_cost'] - simulation['mean_cost']:.4f} 来自串联假设")
+    print("差额来自公式不计未检测次品向下游的传递和反复返工（见 simulate_production_line），不是随机误差")
+
+    # 用同一个模拟器对照问题2和问题4的成本公式，各自转换为多道工序形式后与该题的公式成本比较
+    problem2 = _load_script('2.py')
+    print("\n问题2各情况的公式成本与逐件模拟成本:")
+    for i, situation in enumerate(problem2.situations, 1):
+        decisions_2, cost_2 = problem2.optimize_decisions(situation)
+        line_params, line_decisions = problem2.to_production_line(situation, decisions_2)
+        simulation_2 = simulate_production_line(line_params, line_decisions, [([0, 1], [])], num_units=1000000,
+                                                rng=np.random.default_rng(2024), formula_cost=cost_2)
+        print(f"情况{i}: 公式 {cost_2:.4f}，模拟 {simulation_2['mean_cost']:.4f} ± {simulation_2['std_error']:.4f}，"
+              f"差额 {simulation_2['gap']:.4f}")
+
+    problem4 = _load_script('4.py')
+    nominal_rates = problem4.true_rates_3
+    decisions_4, cost_4 = problem4.optimize_decisions_separable(problem4.params_3, nominal_rates)
+    line_params, line_decisions = problem4.to_production_line(problem4.params_3, decisions_4, nominal_rates)
+    simulation_4 = simulate_production_line(line_params, line_decisions, PROBLEM3_STAGE_INPUTS, num_units=1000000,
+                                            rng=np.random.default_rng(2024), formula_cost=cost_4)
+    print(f"\n问题4（问题3参数，标称次品率）: 公式 {cost_4:.4f}，"
+          f"模拟 {simulation_4['mean_cost']:.4f} ± {simulation_4['std_error']:.4f}，差额 {simulation_4['gap']:.4f}")
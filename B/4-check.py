@@ -0,0 +1,83 @@
+"""
+4.py 与 4-verification.py 实现细节的自检，不属于题目的验证结果，不生成结果文件
+
+运行方式: python 4-check.py，任一检查未通过时以非零状态退出
+"""
+import os
+import sys
+import importlib.util
+import numpy as np
+
+def _load_script(filename, name):
+    """按文件路径导入同目录下的题目脚本，以 name 注册到 sys.modules，进程池的工作进程才能按名称找到其中的函数"""
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)), filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+problem4 = _load_script('4.py', 'problem4')
+verification = _load_script('4-verification.py', 'verification4')
+
+def check_reproducibility(num_iterations=10, seed=2024):
+    """
+    固定种子时 4-verification.analyze_with_sampling 的决策和成本应与进程数、是否使用决策缓存无关
+
+    以串行、不用缓存的穷举求解为基准
+    """
+    params, true_rates, sample_sizes = verification.params, verification.true_rates, verification.sample_sizes
+    reference = verification.analyze_with_sampling(params, true_rates, sample_sizes, num_iterations,
+                                                   seed=seed, processes=1)
+    passed = True
+    for label, options in [('3 个进程', {'processes': 3}),
+                           ('1 个进程 + 决策缓存', {'processes': 1, 'cache_resolution': 0.01}),
+                           ('3 个进程 + 决策缓存', {'processes': 3, 'cache_resolution': 0.01})]:
+        decisions, costs, _ = verification.analyze_with_sampling(params, true_rates, sample_sizes, num_iterations,
+                                                                 seed=seed, **options)
+        if decisions == reference[0] and costs == reference[1]:
+            print(f"通过: {label}的决策和成本与串行穷举求解完全相同")
+        else:
+            print(f"未通过: {label}的决策或成本与串行穷举求解不同")
+            passed = False
+    return passed
+
+def check_array_params():
+    """以 numpy 数组给出的参数应与列表参数得到相同的系数矩阵和决策"""
+    params = verification.params
+    array_params = {name: np.asarray(value) for name, value in params.items()}
+    rates = {'components': [0.1] * 8, 'products': [0.1] * 3}
+    if (np.array_equal(problem4.get_cost_coefficients(array_params), problem4.get_cost_coefficients(params))
+            and problem4.get_decision_cache(array_params).optimize(rates)[0]
+            == problem4.get_decision_cache(params).optimize(rates)[0]):
+        print("通过: 数组参数与列表参数的系数矩阵和决策相同")
+        return True
+    print("未通过: 数组参数与列表参数的结果不同")
+    return False
+
+def check_robust_validation():
+    """optimize_decisions_robust 应对无效的目标或 CVaR 水平抛出 ValueError"""
+    rate_samples = {'components': np.full((10, 8), 0.1), 'products': np.full((10, 3), 0.1)}
+    passed = True
+    for label, options in [("objective='median'", {'objective': 'median'}),
+                           ('level=0', {'objective': 'cvar', 'level': 0}),
+                           ('level=1', {'objective': 'cvar', 'level': 1}),
+                           ('level=1.5', {'objective': 'mean', 'level': 1.5})]:
+        try:
+            problem4.optimize_decisions_robust(verification.params, rate_samples, **options)
+            print(f"未通过: {label} 未被拒绝")
+            passed = False
+        except ValueError:
+            print(f"通过: {label} 被拒绝")
+    return passed
+
+if __name__ == "__main__":
+    results = []
+    print("可复现性检查:")
+    results.append(check_reproducibility())
+    print("\n数组参数检查:")
+    results.append(check_array_params())
+    print("\n稳健决策参数检查:")
+    results.append(check_robust_validation())
+    if not all(results):
+        sys.exit(1)
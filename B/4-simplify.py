@@ -57,7 +57,23 @@ def simulate_sampling(true_rate, sample_size, num_simulations=1000):
         results.append(est_rate)
     return np.mean(results), np.std(results)
 
-def analyze_with_sampling(params, true_rates, sample_sizes):
+def simulate_sampling_batch(true_rates, sample_sizes, num_simulations=1000, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    true_rates = np.asarray(true_rates, dtype=float)
+    sample_sizes = np.asarray(sample_sizes)
+    samples = rng.binomial(sample_sizes[:, None], true_rates[:, None], size=(len(true_rates), num_simulations))
+    est_rates, _ = estimate_defect_rate(sample_sizes[:, None], samples, 0.95)
+    return est_rates.mean(axis=1), est_rates.std(axis=1)
+
+def analyze_with_sampling(params, true_rates, sample_sizes, batched=False, rng=None):
+    if batched:
+        num_components = len(true_rates['components'])
+        est_means, _ = simulate_sampling_batch(true_rates['components'] + true_rates['products'],
+                                               sample_sizes['components'] + sample_sizes['products'], rng=rng)
+        estimated_rates = {'components': est_means[:num_components].tolist(), 'products': est_means[num_components:].tolist()}
+        best_decisions, best_cost = optimize_decisions(params, estimated_rates)
+        return best_decisions, best_cost, estimated_rates
     estimated_rates = {'components': [], 'products': []}
     for rate, size in zip(true_rates['components'], sample_sizes['components']):
         est_mean, est_std = simulate_sampling(rate, size)
@@ -1,18 +1,58 @@
 import itertools
+import os
+import sys
+import importlib.util
 import numpy as np
 from scipy import stats
 
+def _load_script(filename, name):
+    """
+    按文件路径导入同目录下的题目脚本（文件名以数字开头，不能直接 import）
+
+    模块以 name 注册到 sys.modules，进程池的工作进程才能按名称找到其中的函数
+    """
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)), filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+# 运行统计、并行映射、成本系数矩阵和决策缓存使用 4.py 中的实现，两个脚本的统计写入同一个统计对象
+_load_script('4.py', 'problem4')
+from problem4 import enable_instrumentation, disable_instrumentation, _count, _stage, _parallel_map
+from problem4 import get_cost_coefficients, decode_decision, get_decision_cache
+
 def simulate_sampling(true_rate, sample_size, num_simulations=1000):
     """模拟抽样检测过程"""
     results = []
-    for _ in range(num_simulations):
-        sample = np.random.binomial(sample_size, true_rate)
-        est_rate = (sample + 1) / (sample_size + 2)  # Beta分布后验均值
-        results.append(est_rate)
+    with _stage('sampling'):
+        for _ in range(num_simulations):
+            sample = np.random.binomial(sample_size, true_rate)
+            est_rate = (sample + 1) / (sample_size + 2)  # Beta分布后验均值
+            results.append(est_rate)
+    _count('rng_calls', num_simulations)
+    _count('rng_draws', num_simulations)
     return np.mean(results), np.std(results)
 
+def simulate_sampling_batch(true_rates, sample_sizes, num_simulations=1000, rng=None):
+    """批量模拟抽样检测：用一次数组调用抽取所有零配件/产品的全部样本"""
+    if rng is None:
+        rng = np.random.default_rng()
+    true_rates = np.asarray(true_rates, dtype=float)
+    sample_sizes = np.asarray(sample_sizes)
+
+    with _stage('sampling'):
+        samples = rng.binomial(sample_sizes[:, None], true_rates[:, None], size=(len(true_rates), num_simulations))
+    _count('rng_calls')
+    _count('rng_draws', samples.size)
+    with _stage('estimation'):
+        est_rates = (samples + 1) / (sample_sizes[:, None] + 2)  # Beta分布后验均值
+    return est_rates.mean(axis=1), est_rates.std(axis=1)
+
 def calculate_cost(params, decisions, estimated_rates):
     """计算给定决策和估计次品率下的总成本"""
+    _count('cost_evaluations')
     total_cost = 0
     
     # 零配件成本
@@ -49,6 +89,7 @@ def calculate_cost(params, decisions, estimated_rates):
 
 def optimize_decisions(params, estimated_rates):
     """找出最优决策"""
+    _count('optimizer_calls')
     best_cost = float('inf')
     best_decisions = None
     
@@ -69,18 +110,23 @@ def optimize_decisions(params, estimated_rates):
     
     return best_decisions, best_cost
 
-def analyze_with_sampling(params, true_rates, sample_sizes, num_iterations=100):
-    """进行多次抽样分析"""
-    all_decisions = []
-    all_costs = []
-    all_estimated_rates = []
+def _sampling_iteration(params, true_rates, sample_sizes, batched, rng, cache_resolution=None):
+    """一次抽样分析：估计次品率并求最优决策，给定 cache_resolution 时用本进程的 DecisionCache 代替穷举求解"""
+    estimated_rates = {
+        'components': [],
+        'products': []
+    }
     
-    for _ in range(num_iterations):
-        estimated_rates = {
-            'components': [],
-            'products': []
-        }
-        
+    if batched:
+        num_components = len(true_rates['components'])
+        est_means, _ = simulate_sampling_batch(
+            true_rates['components'] + true_rates['products'],
+            sample_sizes['components'] + sample_sizes['products'],
+            rng=rng
+        )
+        estimated_rates['components'] = est_means[:num_components].tolist()
+        estimated_rates['products'] = est_means[num_components:].tolist()
+    else:
         for rate, size in zip(true_rates['components'], sample_sizes['components']):
             est_mean, _ = simulate_sampling(rate, size)
             estimated_rates['components'].append(est_mean)
@@ -88,12 +134,83 @@ def analyze_with_sampling(params, true_rates, sample_sizes, num_iterations=100):
         for rate, size in zip(true_rates['products'], sample_sizes['products']):
             est_mean, _ = simulate_sampling(rate, size)
             estimated_rates['products'].append(est_mean)
-        
-        best_decisions, best_cost = optimize_decisions(params, estimated_rates)
-        all_decisions.append(best_decisions)
-        all_costs.append(best_cost)
-        all_estimated_rates.append(estimated_rates)
     
+    with _stage('optimization'):
+        if cache_resolution is None:
+            best_decisions, best_cost = optimize_decisions(params, estimated_rates)
+        else:
+            # 成本按本脚本的 calculate_cost 计算，与穷举求解逐位相同
+            best_decisions, _ = get_decision_cache(params, cache_resolution).optimize(estimated_rates)
+            best_cost = calculate_cost(params, best_decisions, estimated_rates)
+    return best_decisions, best_cost, estimated_rates
+
+def _seeded_sampling_iteration(args):
+    params, true_rates, sample_sizes, seed_sequence, cache_resolution = args
+    return _sampling_iteration(params, true_rates, sample_sizes, True, np.random.default_rng(seed_sequence),
+                               cache_resolution)
+
+def analyze_with_sampling(params, true_rates, sample_sizes, num_iterations=100, batched=False, rng=None,
+                          seed=None, processes=None, cache_resolution=None):
+    """
+    进行多次抽样分析
+
+    batched: 为 True 时每次迭代用 simulate_sampling_batch 一次性抽取全部样本
+    rng: 批量模式使用的 numpy.random.Generator，默认新建一个
+    seed, processes: 给定其一时使用并行模式，每次迭代使用由 SeedSequence(seed) 派生的独立随机数流，
+        在进程池中运行（processes 为进程数，None 为 CPU 核数，1 为串行），给定 seed 时结果与进程数无关
+    cache_resolution: 给定时每个进程用 get_decision_cache(params, cache_resolution) 复用最优决策，
+        决策和成本都与穷举求解相同
+    """
+    if seed is not None or processes is not None:
+        seed_sequences = np.random.SeedSequence(seed).spawn(num_iterations)
+        tasks = [(params, true_rates, sample_sizes, seed_sequence, cache_resolution) for seed_sequence in seed_sequences]
+        results = _parallel_map(_seeded_sampling_iteration, tasks, processes)
+    else:
+        if batched and rng is None:
+            rng = np.random.default_rng()
+        results = [_sampling_iteration(params, true_rates, sample_sizes, batched, rng, cache_resolution)
+                   for _ in range(num_iterations)]
+    
+    all_decisions = [decisions for decisions, _, _ in results]
+    all_costs = [cost for _, cost, _ in results]
+    all_estimated_rates = [rates for _, _, rates in results]
+    return all_decisions, all_costs, all_estimated_rates
+
+def analyze_with_sampling_tensorized(params, true_rates, sample_sizes, num_iterations=100, num_simulations=1000,
+                                     rng=None):
+    """
+    张量化的多次抽样分析，结果形式与 analyze_with_sampling 相同
+
+    一次抽取形状为 (迭代数, 零配件及产品数, 模拟次数) 的全部样本，按数组计算 Beta 后验均值，
+    再用一次矩阵乘法求出每次迭代下全部决策组合的成本并取最小值；
+    成本相同时取枚举顺序中的第一个，与 optimize_decisions 一致（成本在浮点误差内相同）
+    rng: numpy.random.Generator，默认新建一个
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    num_components = len(true_rates['components'])
+    rates = np.asarray(true_rates['components'] + true_rates['products'], dtype=float)
+    sizes = np.asarray(sample_sizes['components'] + sample_sizes['products'])
+
+    with _stage('sampling'):
+        samples = rng.binomial(sizes[None, :, None], rates[None, :, None],
+                               size=(num_iterations, len(rates), num_simulations))
+    _count('rng_calls')
+    _count('rng_draws', samples.size)
+    with _stage('estimation'):
+        est_rates = ((samples + 1) / (sizes[None, :, None] + 2)).mean(axis=2)  # Beta分布后验均值
+
+    with _stage('optimization'):
+        coefficients = get_cost_coefficients(params)
+        costs = coefficients[:, 0] + est_rates @ coefficients[:, 1:].T
+        best_codes = np.argmin(costs, axis=1)
+    _count('optimizer_calls', num_iterations)
+    _count('cost_evaluations', costs.size)
+
+    all_decisions = [decode_decision(params, int(code)) for code in best_codes]
+    all_costs = costs[np.arange(num_iterations), best_codes].tolist()
+    all_estimated_rates = [{'components': row[:num_components].tolist(), 'products': row[num_components:].tolist()}
+                           for row in est_rates]
     return all_decisions, all_costs, all_estimated_rates
 
 # 问题4的参数（基于问题3的数据）
@@ -117,56 +234,68 @@ sample_sizes = {
     'products': [100, 100, 100]
 }
 
-# 运行多次分析
-all_decisions, all_costs, all_estimated_rates = analyze_with_sampling(params, true_rates, sample_sizes)
+if __name__ == "__main__":
+    # 设置环境变量 INSTRUMENT_REPORT=<路径.json> 时统计调用次数、各阶段耗时和峰值内存
+    instrument_report = os.environ.get('INSTRUMENT_REPORT')
+    if instrument_report:
+        enable_instrumentation()
 
-# 分析结果
-most_common_decision = max(set(tuple(d['component_inspections']) for d in all_decisions), key=lambda x: [d['component_inspections'] for d in all_decisions].count(x))
-average_cost = np.mean(all_costs)
-std_cost = np.std(all_costs)
+    # 运行多次分析
+    all_decisions, all_costs, all_estimated_rates = analyze_with_sampling_tensorized(
+        params, true_rates, sample_sizes, rng=np.random.default_rng(2024))
 
-print("基于抽样检测的分析结果:")
-print(f"最常见的零配件检测决策: {most_common_decision}")
-print(f"平均成本: {average_cost:.2f} ± {std_cost:.2f}")
+    # 分析结果
+    most_common_decision = max(set(tuple(d['component_inspections']) for d in all_decisions), key=lambda x: [d['component_inspections'] for d in all_decisions].count(x))
+    average_cost = np.mean(all_costs)
+    std_cost = np.std(all_costs)
 
-# 验证给定的决策
-given_decisions = {
-    'component_inspections': (False, False, False, False, False, False, False, False),
-    'product_inspections': (False, False, False),
-    'product_disassembles': (True, True, True)
-}
+    print("基于抽样检测的分析结果:")
+    print(f"最常见的零配件检测决策: {most_common_decision}")
+    print(f"平均成本: {average_cost:.2f} ± {std_cost:.2f}")
 
-# 使用平均估计次品率计算给定决策的成本
-average_estimated_rates = {
-    'components': [np.mean([rates['components'][i] for rates in all_estimated_rates]) for i in range(8)],
-    'products': [np.mean([rates['products'][i] for rates in all_estimated_rates]) for i in range(3)]
-}
-given_cost = calculate_cost(params, given_decisions, average_estimated_rates)
-
-print("\n给定决策的成本:")
-print(f"成本: {given_cost:.2f}")
-
-# 比较结果
-print("\n验证结果:")
-if abs(given_cost - average_cost) < std_cost:
-    print("验证通过：给定的决策在合理范围内")
-else:
-    print("验证失败：给定的决策可能不是最优的")
-    print(f"与平均最优成本的差异: {given_cost - average_cost:.2f}")
-
-# 敏感性分析
-print("\n敏感性分析:")
-for param in ['component_prices', 'assembly_costs', 'replacement_cost']:
-    if isinstance(params[param], list):
-        for i in range(len(params[param])):
-            original_value = params[param][i]
-            params[param][i] *= 1.1  # 增加10%
-            _, new_costs, _ = analyze_with_sampling(params, true_rates, sample_sizes, num_iterations=20)
-            print(f"{param}[{i}] 增加10%后的平均成本: {np.mean(new_costs):.2f}")
-            params[param][i] = original_value  # 恢复原值
+    # 验证给定的决策
+    given_decisions = {
+        'component_inspections': (False, False, False, False, False, False, False, False),
+        'product_inspections': (False, False, False),
+        'product_disassembles': (True, True, True)
+    }
+
+    # 使用平均估计次品率计算给定决策的成本
+    average_estimated_rates = {
+        'components': [np.mean([rates['components'][i] for rates in all_estimated_rates]) for i in range(8)],
+        'products': [np.mean([rates['products'][i] for rates in all_estimated_rates]) for i in range(3)]
+    }
+    given_cost = calculate_cost(params, given_decisions, average_estimated_rates)
+
+    print("\n给定决策的成本:")
+    print(f"成本: {given_cost:.2f}")
+
+    # 比较结果
+    print("\n验证结果:")
+    if abs(given_cost - average_cost) < std_cost:
+        print("验证通过：给定的决策在合理范围内")
     else:
-        original_value = params[param]
-        params[param] *= 1.1  # 增加10%
-        _, new_costs, _ = analyze_with_sampling(params, true_rates, sample_sizes, num_iterations=20)
-        print(f"{param} 增加10%后的平均成本: {np.mean(new_costs):.2f}")
-        params[param] = original_value  # 恢复原值
\ No newline at end of file
+        print("验证失败：给定的决策可能不是最优的")
+        print(f"与平均最优成本的差异: {given_cost - average_cost:.2f}")
+
+    # 敏感性分析
+    print("\n敏感性分析:")
+    for param in ['component_prices', 'assembly_costs', 'replacement_cost']:
+        if isinstance(params[param], list):
+            for i in range(len(params[param])):
+                # 在参数副本上修改，不改动共享的 params
+                values = list(params[param])
+                values[i] *= 1.1  # 增加10%
+                _, new_costs, _ = analyze_with_sampling_tensorized(
+                    dict(params, **{param: values}), true_rates, sample_sizes, num_iterations=20,
+                    rng=np.random.default_rng(2024))
+                print(f"{param}[{i}] 增加10%后的平均成本: {np.mean(new_costs):.2f}")
+        else:
+            _, new_costs, _ = analyze_with_sampling_tensorized(
+                dict(params, **{param: params[param] * 1.1}), true_rates, sample_sizes, num_iterations=20,  # 增加10%
+                rng=np.random.default_rng(2024))
+            print(f"{param} 增加10%后的平均成本: {np.mean(new_costs):.2f}")
+
+    if instrument_report:
+        disable_instrumentation().save(instrument_report)
+        print(f"\n运行统计已保存到 {instrument_report}")
@@ -1,24 +1,177 @@
 import numpy as np
-from scipy import stats
 import itertools
-import matplotlib.pyplot as plt
 import os
+import json
+import time
+import hashlib
+import functools
+import contextlib
+import collections
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+import separability
+
+def _pyplot():
+    """延迟导入 matplotlib：只有绘图时才加载绘图库，并设置中文字体"""
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # 或者使用 'Heiti TC'
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+    return plt
+
+class RunInstrumentation:
+    """
+    可选的运行统计：调用计数、分阶段计时和峰值内存
+
+    cost_evaluations 为各决策组合按点估计次品率求成本的次数；optimize_decisions_robust 在次品率样本上
+    计算的成本矩阵元素数另计为 robust_cost_evaluations
+    阶段可以嵌套，每个阶段只记录自身耗时（不含嵌套阶段），各阶段之和即为被统计的总耗时
+    """
+
+    def __init__(self, trace_memory=False):
+        self.counters = collections.Counter()
+        self.stage_seconds = collections.defaultdict(float)
+        self.stage_calls = collections.Counter()
+        self.trace_memory = trace_memory
+        self.peak_traced_memory = None
+        self._stack = []
+        self._started = time.perf_counter()
+        if trace_memory:
+            tracemalloc.start()
+
+    def stop(self):
+        """停止 tracemalloc 并记录 Python 分配的峰值内存"""
+        if self.trace_memory and self.peak_traced_memory is None:
+            self.peak_traced_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        frame = [time.perf_counter(), 0.0]  # [开始时间, 嵌套阶段耗时]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.stage_seconds[name] += elapsed - frame[1]
+            self.stage_calls[name] += 1
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def stats(self):
+        """可跨进程传递的计数和阶段耗时"""
+        return dict(self.counters), dict(self.stage_seconds), dict(self.stage_calls)
+
+    def merge(self, stats):
+        """合并其他进程中 stats() 的返回值"""
+        counters, stage_seconds, stage_calls = stats
+        self.counters.update(counters)
+        for name, seconds in stage_seconds.items():
+            self.stage_seconds[name] += seconds
+        self.stage_calls.update(stage_calls)
+
+    def report(self):
+        report = {
+            'wall_seconds': time.perf_counter() - self._started,
+            'counters': dict(self.counters),
+            'stages': {name: {'seconds': seconds, 'calls': self.stage_calls[name]}
+                       for name, seconds in self.stage_seconds.items()}
+        }
+        if self.trace_memory:
+            peak = self.peak_traced_memory
+            report['peak_traced_memory_bytes'] = tracemalloc.get_traced_memory()[1] if peak is None else peak
+        try:
+            import resource
+            # Linux 上单位为 KB，macOS 上为字节；进程池的工作进程结束后计入 peak_rss_children（其中最大的一个）
+            report['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['peak_rss_children'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        except ImportError:
+            pass
+        return report
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+# 当前启用的统计对象，为 None 时所有统计调用都直接返回
+_instrumentation = None
+
+def enable_instrumentation(trace_memory=False):
+    """启用运行统计并返回统计对象；trace_memory 为 True 时用 tracemalloc 记录 Python 分配的峰值内存（较慢）"""
+    global _instrumentation
+    _instrumentation = RunInstrumentation(trace_memory)
+    return _instrumentation
+
+def disable_instrumentation():
+    """停用运行统计，返回停用前的统计对象"""
+    global _instrumentation
+    instrumentation, _instrumentation = _instrumentation, None
+    if instrumentation is not None:
+        instrumentation.stop()
+    return instrumentation
+
+def _count(name, amount=1):
+    if _instrumentation is not None:
+        _instrumentation.count(name, amount)
+
+def _stage(name):
+    if _instrumentation is None:
+        return contextlib.nullcontext()
+    return _instrumentation.stage(name)
+
+def _instrumented_call(args):
+    """在工作进程中运行 func(task)，同时返回本次调用的统计数据，供主进程合并"""
+    global _instrumentation
+    func, task = args
+    previous = _instrumentation
+    _instrumentation = RunInstrumentation()
+    try:
+        result = func(task)
+        return result, _instrumentation.stats()
+    finally:
+        _instrumentation = previous
+
+def _parallel_map(func, tasks, processes):
+    """
+    对每个任务调用 func，processes 为 1 时在当前进程串行计算，否则在进程池中运行（None 为 CPU 核数）
+
+    启用运行统计时各工作进程分别统计并合并到当前的统计对象中，此时阶段耗时为各进程耗时之和
+    """
+    if processes == 1:
+        return list(map(func, tasks))
+    workers = processes or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if _instrumentation is None:
+            return list(executor.map(func, tasks, chunksize=chunksize))
+        outputs = list(executor.map(_instrumented_call, [(func, task) for task in tasks], chunksize=chunksize))
+    for _, stats in outputs:
+        _instrumentation.merge(stats)
+    return [result for result, _ in outputs]
 
 def calculate_sample_size(confidence_level, defect_rate, precision):
+    from scipy import stats
     z_score = stats.norm.ppf((1 + confidence_level) / 2)
     sample_size = int(np.ceil((z_score**2 * defect_rate * (1 - defect_rate)) / (precision**2)))
     return sample_size
 
+@functools.lru_cache(maxsize=None)
+def _normal_quantile(confidence_level):
+    """双侧置信水平对应的正态分位数；estimate_defect_rate 在逐次抽样的循环中调用，分位数只计算一次"""
+    from scipy import stats
+    return stats.norm.ppf((1 + confidence_level) / 2)
+
 def estimate_defect_rate(sample_size, defects, confidence_level):
     defect_rate = defects / sample_size
-    margin_of_error = stats.norm.ppf((1 + confidence_level) / 2) * np.sqrt(defect_rate * (1 - defect_rate) / sample_size)
+    margin_of_error = _normal_quantile(confidence_level) * np.sqrt(defect_rate * (1 - defect_rate) / sample_size)
     return defect_rate, (defect_rate - margin_of_error, defect_rate + margin_of_error)
 
 def calculate_cost(params, decisions, estimated_rates):
+    _count('cost_evaluations')
     total_cost = 0
     
     # 零配件成本
@@ -53,6 +206,7 @@ def calculate_cost(params, decisions, estimated_rates):
     return total_cost
 
 def optimize_decisions(params, estimated_rates):
+    _count('optimizer_calls')
     best_cost = float('inf')
     best_decisions = None
     
@@ -71,15 +225,437 @@ def optimize_decisions(params, estimated_rates):
     
     return best_decisions, best_cost
 
+def to_production_line(params, decisions, estimated_rates):
+    """
+    把本题的参数、决策和估计次品率转换为 3.py 中 simulate_production_line 使用的参数形式
+
+    不合格成品流入市场时每件损失 replacement_cost，对应 3.py 的 market_price；
+    转换后 3.py 的 calculate_cost 与本题的 calculate_cost 是同一个公式
+    返回 (工序参数, 工序决策)
+    """
+    line_params = {
+        'component_defect_rates': list(estimated_rates['components']),
+        'component_prices': list(params['component_prices']),
+        'component_inspect_costs': list(params['component_inspect_costs']),
+        'product_defect_rates': list(estimated_rates['products']),
+        'assembly_costs': list(params['assembly_costs']),
+        'product_inspect_costs': list(params['product_inspect_costs']),
+        'disassemble_costs': list(params['disassemble_costs']),
+        'market_price': params['replacement_cost']
+    }
+    return line_params, dict(decisions)
+
+def decision_terms(params, estimated_rates):
+    """
+    将总成本分解为常数项与各决策的独立项
+
+    返回 (常数项, 选择是时的成本数组, 选择否时的成本数组)，数组按
+    零配件检测、产品检测、产品拆解的顺序排列；
+    市场调换损失只取决于最后一道工序是否检测，因此并入该检测项
+    """
+    component_prices = np.asarray(params['component_prices'], dtype=float)
+    component_rates = np.asarray(estimated_rates['components'], dtype=float)
+    product_rates = np.asarray(estimated_rates['products'], dtype=float)
+    assembly_costs = np.asarray(params['assembly_costs'], dtype=float)
+
+    constant = assembly_costs.sum()
+
+    replacement_loss = np.zeros(len(assembly_costs))
+    replacement_loss[-1] = product_rates[-1] * params['replacement_cost']
+
+    cost_if_true = np.concatenate([
+        component_prices + np.asarray(params['component_inspect_costs'], dtype=float),
+        np.asarray(params['product_inspect_costs'], dtype=float),
+        product_rates * np.asarray(params['disassemble_costs'], dtype=float)
+    ])
+    cost_if_false = np.concatenate([
+        component_prices * (1 + component_rates),
+        replacement_loss,
+        product_rates * (sum(params['component_prices']) + assembly_costs)
+    ])
+    return constant, cost_if_true, cost_if_false
+
+def _split_flags(params, flags):
+    """把按 decision_terms 顺序排列的决策向量拆成决策字典"""
+    num_components = len(params['component_prices'])
+    num_products = len(params['assembly_costs'])
+    flags = [bool(flag) for flag in flags]
+    return {
+        'component_inspections': tuple(flags[:num_components]),
+        'product_inspections': tuple(flags[num_components:num_components + num_products]),
+        'product_disassembles': tuple(flags[num_components + num_products:])
+    }
+
+def is_separable(params, estimated_rates):
+    """
+    检查 decision_terms 的分解结果与 calculate_cost 是否一致（见 separability.is_separable）
+
+    决策之间存在交叉项或两者不一致时返回 False
+    """
+    constant, cost_if_true, cost_if_false = decision_terms(params, estimated_rates)
+    return separability.is_separable(
+        lambda matrix: [calculate_cost(params, _split_flags(params, flags), estimated_rates) for flags in matrix],
+        constant, cost_if_true, cost_if_false)
+
+def optimize_decisions_separable(params, estimated_rates):
+    """
+    利用成本的可加性逐项独立求解
+
+    逐项求解为 O(决策数)，另加 separability.is_separable 的检查，为 O(决策数²)；
+    决策数不超过 separability.BRUTE_FORCE_FLAGS 或分解不成立时退回到 optimize_decisions 穷举
+    """
+    num_flags = len(params['component_prices']) + 2 * len(params['assembly_costs'])
+    if num_flags <= separability.BRUTE_FORCE_FLAGS or not is_separable(params, estimated_rates):
+        return optimize_decisions(params, estimated_rates)
+    _count('optimizer_calls')
+    best_decisions = _split_flags(params, separability.separable_flags(*decision_terms(params, estimated_rates)))
+    return best_decisions, calculate_cost(params, best_decisions, estimated_rates)
+
+def build_decision_matrix(num_flags):
+    """
+    将全部决策组合编码为布尔矩阵
+
+    每行对应一种组合，行顺序与 optimize_decisions 中 itertools.product([True, False], ...) 的枚举顺序一致
+    """
+    rows = np.arange(2 ** num_flags)
+    shifts = np.arange(num_flags - 1, -1, -1)
+    return ((rows[:, None] >> shifts) & 1) == 0
+
+def build_cost_coefficients(params):
+    """
+    构造全部决策组合的成本系数矩阵
+
+    固定决策时成本是估计次品率的一次函数，矩阵形状为 (2^决策数, 1 + 零配件数 + 产品数)：
+    第 0 列为常数项，其余各列依次为各零配件、各产品次品率的系数，
+    即成本 = 系数矩阵 @ [1, 零配件次品率..., 产品次品率...]；行顺序与 build_decision_matrix 相同
+    """
+    component_prices = np.asarray(params['component_prices'], dtype=float)
+    assembly_costs = np.asarray(params['assembly_costs'], dtype=float)
+    num_components = len(component_prices)
+    num_products = len(assembly_costs)
+
+    decision_matrix = build_decision_matrix(num_components + 2 * num_products)
+    component_inspections = decision_matrix[:, :num_components]
+    product_inspections = decision_matrix[:, num_components:num_components + num_products]
+    product_disassembles = decision_matrix[:, num_components + num_products:]
+
+    coefficients = np.empty((len(decision_matrix), 1 + num_components + num_products))
+    coefficients[:, 0] = (
+        (component_prices + np.where(component_inspections, np.asarray(params['component_inspect_costs'], dtype=float), 0.0)).sum(axis=1)
+        + assembly_costs.sum()
+        + np.where(product_inspections, np.asarray(params['product_inspect_costs'], dtype=float), 0.0).sum(axis=1)
+    )
+    coefficients[:, 1:1 + num_components] = np.where(component_inspections, 0.0, component_prices)
+    coefficients[:, 1 + num_components:] = np.where(product_disassembles,
+                                                    np.asarray(params['disassemble_costs'], dtype=float),
+                                                    component_prices.sum() + assembly_costs)
+    # 市场调换损失
+    coefficients[:, -1] += np.where(product_inspections[:, -1], 0.0, params['replacement_cost'])
+    return coefficients
+
+def _params_json(params):
+    """参数的规范 JSON 表示，用作缓存键；numpy 数组和标量先转换为列表和 Python 数值"""
+    return json.dumps(params, sort_keys=True, default=lambda value: np.asarray(value).tolist())
+
+@functools.lru_cache(maxsize=16)
+def _cached_cost_coefficients(params_json):
+    coefficients = build_cost_coefficients(json.loads(params_json))
+    coefficients.flags.writeable = False
+    return coefficients
+
+# 已打开的系数矩阵文件，同一路径在进程内只映射一次
+_coefficient_files = {}
+
+def get_cost_coefficients(params, cache_dir=None):
+    """
+    带缓存的 build_cost_coefficients，同一组参数只计算一次，返回只读数组
+
+    给定 cache_dir 时系数矩阵以 .npy 文件保存在该目录（文件名由参数的哈希值决定），
+    之后的运行和各工作进程都以内存映射方式读取同一文件，不再重新计算或复制
+    """
+    params_json = _params_json(params)
+    if cache_dir is None:
+        return _cached_cost_coefficients(params_json)
+
+    digest = hashlib.sha256(params_json.encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'cost_coefficients_{digest}.npy')
+    if path not in _coefficient_files:
+        if not os.path.exists(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            # 先写临时文件再替换，避免其他进程读到不完整的文件
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                np.save(f, build_cost_coefficients(json.loads(params_json)))
+            os.replace(temp_path, path)
+        _coefficient_files[path] = np.load(path, mmap_mode='r')
+    return _coefficient_files[path]
+
+def optimize_decisions_affine(params, estimated_rates, cache_dir=None):
+    """
+    用预先计算的成本系数矩阵求最优决策，每次只需一次矩阵-向量乘法
+
+    成本相同时取枚举顺序中的第一个，与 optimize_decisions 一致（成本在浮点误差内相同）
+    cache_dir: 传给 get_cost_coefficients，用于在多次运行和多个进程之间共享系数矩阵
+    """
+    _count('optimizer_calls')
+    coefficients = get_cost_coefficients(params, cache_dir)
+    rates = np.concatenate([[1.0], estimated_rates['components'], estimated_rates['products']])
+    costs = coefficients @ rates
+    _count('cost_evaluations', len(costs))
+    code = int(np.argmin(costs))
+    return decode_decision(params, code), float(costs[code])
+
+def decode_decision(params, code):
+    """将决策编码（build_decision_matrix 中的行号）还原为决策字典"""
+    num_components = len(params['component_prices'])
+    num_products = len(params['assembly_costs'])
+    num_flags = num_components + 2 * num_products
+    # 行号的二进制位为 0 表示"是"
+    flags = [not (code >> shift) & 1 for shift in range(num_flags - 1, -1, -1)]
+    return {
+        'component_inspections': tuple(flags[:num_components]),
+        'product_inspections': tuple(flags[num_components:num_components + num_products]),
+        'product_disassembles': tuple(flags[num_components + num_products:])
+    }
+
+class DecisionCache:
+    """
+    以量化后的估计次品率为键的最优决策缓存（LRU）
+
+    同一个键下的次品率每一项相差不超过 resolution。每个缓存项记录求解时的次品率 r0 和最优决策，
+    并找出在该范围内可能反超最优决策的"相近"决策（成本差 gap 小于系数差乘以 resolution 之和）；
+    对新的次品率 r 只需检查这些相近决策在 r 处是否仍不优于缓存的决策，通过时直接返回缓存的决策，否则重新求解并更新缓存项；
+    无论是否命中，成本都用 calculate_cost 按 r 计算，与 optimize_decisions 逐位相同，不受缓存状态和进程数影响
+    resolution: 量化步长，越小需检查的相近决策越少，但命中率越低；只影响速度，不影响结果
+    maxsize: 最多保留的缓存项数，超出时淘汰最久未使用的一项
+    """
+
+    def __init__(self, params, resolution=0.01, maxsize=1024, cache_dir=None):
+        self.params = params
+        self.coefficients = np.asarray(get_cost_coefficients(params, cache_dir))
+        self.resolution = resolution
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+        self._entries = collections.OrderedDict()
+
+    def optimize(self, estimated_rates):
+        """返回 (最优决策, 成本)，与 optimize_decisions 的结果相同"""
+        rates = np.concatenate([[1.0], estimated_rates['components'], estimated_rates['products']])
+        key = tuple(np.round(rates[1:] / self.resolution).astype(np.int64).tolist())
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self._entries.move_to_end(key)
+            code, reference, near, near_differences, near_gaps, strict = entry
+            margins = near_gaps + near_differences @ (rates - reference)
+            # 枚举顺序在缓存决策之前的决策必须严格更差，之后的允许成本相同
+            if np.all((margins > 0) | (~strict & (margins >= 0))):
+                self.hits += 1
+                _count('decision_cache_hits')
+                return self._result(code, estimated_rates)
+            self.rejections += 1
+
+        _count('optimizer_calls')
+        costs = self.coefficients @ rates
+        _count('cost_evaluations', len(costs))
+        code = int(np.argmin(costs))
+
+        differences = self.coefficients - self.coefficients[code]
+        gaps = costs - costs[code]
+        near = np.flatnonzero(gaps <= np.abs(differences[:, 1:]).sum(axis=1) * self.resolution)
+        near = near[near != code]
+        self._entries[key] = (code, rates, near, differences[near], gaps[near], near < code)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return self._result(code, estimated_rates)
+
+    def _result(self, code, estimated_rates):
+        # 矩阵乘法的累加顺序与 calculate_cost 不同，末位可能不一致，成本统一由 calculate_cost 重新计算
+        decisions = decode_decision(self.params, code)
+        return decisions, calculate_cost(self.params, decisions, estimated_rates)
+
+@functools.lru_cache(maxsize=16)
+def _cached_decision_cache(params_json, resolution):
+    return DecisionCache(json.loads(params_json), resolution)
+
+def get_decision_cache(params, resolution=0.01):
+    """返回当前进程中这组参数共用的 DecisionCache，进程池中的每个工作进程各有一个"""
+    return _cached_decision_cache(_params_json(params), resolution)
+
 # 模拟抽样检测
 def simulate_sampling(true_rate, sample_size, num_simulations=1000):
     results = []
-    for _ in range(num_simulations):
-        sample = np.random.binomial(sample_size, true_rate)
-        est_rate, _ = estimate_defect_rate(sample_size, sample, 0.95)
-        results.append(est_rate)
+    with _stage('sampling'):
+        for _ in range(num_simulations):
+            sample = np.random.binomial(sample_size, true_rate)
+            est_rate, _ = estimate_defect_rate(sample_size, sample, 0.95)
+            results.append(est_rate)
+    _count('rng_calls', num_simulations)
+    _count('rng_draws', num_simulations)
     return np.mean(results), np.std(results)
 
+SAMPLING_METHODS = ['independent', 'antithetic', 'sobol']
+
+def _uniform_draws(method, num_items, num_simulations, rng):
+    """按方差缩减方法生成 (项数, 模拟次数) 的 [0, 1) 均匀数"""
+    if method == 'antithetic':
+        # 对偶变量：u 与 1 - u 成对使用，奇数次时最后一个抽样无法配对
+        if num_simulations % 2:
+            raise ValueError("对偶抽样的模拟次数必须为偶数")
+        half = rng.random((num_items, num_simulations // 2))
+        return np.concatenate([half, 1 - half], axis=1)
+    if method == 'sobol':
+        from scipy.stats import qmc
+        # 取加扰 Sobol 序列的前 num_simulations 个点，模拟次数为 2 的幂时均匀性最好
+        engine = qmc.Sobol(d=num_items, scramble=True, seed=rng)
+        points = engine.random_base2(int(np.ceil(np.log2(max(num_simulations, 1)))))
+        return points[:num_simulations].T
+    raise ValueError(f"未知的抽样方法: {method}")
+
+def simulate_sampling_batch(true_rates, sample_sizes, num_simulations=1000, rng=None, method='independent'):
+    """
+    批量模拟抽样检测：用一次数组调用抽取所有零配件/产品的全部样本
+
+    true_rates, sample_sizes: 各零配件/产品的真实次品率与样本量
+    rng: numpy.random.Generator，默认新建一个
+    method: SAMPLING_METHODS 之一；'independent' 为独立抽样，'antithetic'（模拟次数须为偶数）和 'sobol' 分别用对偶变量和
+        拟蒙特卡洛均匀数经二项分布的逆分布函数得到次品数，可用较少的模拟次数达到相同精度
+    返回各项估计次品率的均值和标准差数组
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    true_rates = np.asarray(true_rates, dtype=float)
+    sample_sizes = np.asarray(sample_sizes)
+
+    with _stage('sampling'):
+        if method == 'independent':
+            samples = rng.binomial(sample_sizes[:, None], true_rates[:, None], size=(len(true_rates), num_simulations))
+        else:
+            from scipy import stats
+            uniforms = _uniform_draws(method, len(true_rates), num_simulations, rng)
+            # u = 0 时 ppf 返回 -1
+            samples = np.maximum(stats.binom.ppf(uniforms, sample_sizes[:, None], true_rates[:, None]), 0)
+    with _stage('estimation'):
+        est_rates, _ = estimate_defect_rate(sample_sizes[:, None], samples, 0.95)
+    _count('rng_calls')
+    _count('rng_draws', samples.size)
+    return est_rates.mean(axis=1), est_rates.std(axis=1)
+
+class BetaPosteriorEstimator:
+    """
+    流式估计各零配件和产品的次品率
+
+    每一项的次品率采用共轭的 Beta 先验，每到一批检测结果只需累加次品数和合格数，
+    更新代价与历史数据量无关；默认先验 Beta(1, 1) 下后验均值为 (x + 1) / (n + 2)
+    所有返回值都为 {'components': ..., 'products': ...} 形式，与 estimated_rates 相同
+    """
+
+    def __init__(self, num_components, num_products, prior_alpha=1.0, prior_beta=1.0):
+        self.num_components = num_components
+        self.num_products = num_products
+        self.alpha = np.full(num_components + num_products, float(prior_alpha))
+        self.beta = np.full(num_components + num_products, float(prior_beta))
+
+    def _split(self, values):
+        return {'components': values[..., :self.num_components], 'products': values[..., self.num_components:]}
+
+    def update(self, defects, inspected):
+        """
+        加入一批检测结果
+
+        defects, inspected: {'components': [...], 'products': [...]} 形式的本批次品数和检测件数，
+        本批未检测的项填 0
+        """
+        defects = np.asarray(list(defects['components']) + list(defects['products']), dtype=float)
+        inspected = np.asarray(list(inspected['components']) + list(inspected['products']), dtype=float)
+        if np.any(defects < 0) or np.any(defects > inspected):
+            raise ValueError("次品数必须在 0 到检测件数之间")
+        self.alpha += defects
+        self.beta += inspected - defects
+        _count('posterior_updates')
+
+    def mean(self):
+        """后验均值，可直接作为 estimated_rates 传给各优化函数"""
+        means = self.alpha / (self.alpha + self.beta)
+        return {name: values.tolist() for name, values in self._split(means).items()}
+
+    def credible_interval(self, level=0.95):
+        """等尾可信区间，返回 (下限, 上限)"""
+        from scipy import stats
+        lower = stats.beta.ppf((1 - level) / 2, self.alpha, self.beta)
+        upper = stats.beta.ppf((1 + level) / 2, self.alpha, self.beta)
+        return ({name: values.tolist() for name, values in self._split(lower).items()},
+                {name: values.tolist() for name, values in self._split(upper).items()})
+
+    def sample(self, num_samples, rng=None):
+        """从后验中抽取 num_samples 组相互独立的次品率，各值为 (num_samples, 零配件数/产品数) 数组"""
+        if rng is None:
+            rng = np.random.default_rng()
+        return self._split(rng.beta(self.alpha, self.beta, size=(num_samples, len(self.alpha))))
+
+def optimize_decisions_robust(params, rate_samples, objective='mean', level=0.9, chunk_size=4096, cache_dir=None):
+    """
+    考虑次品率估计不确定性的稳健决策：在大量后验次品率样本上评估全部决策组合
+
+    rate_samples: {'components': (样本数, 零配件数), 'products': (样本数, 产品数)} 数组，
+        例如 BetaPosteriorEstimator.sample 的返回值
+    objective: 'mean' 最小化期望成本；'cvar' 最小化成本最高的 1 - level 部分样本的平均成本（CVaR）
+    所有决策在同一组样本上比较（公共随机数），决策之间的成本差不含抽样噪声；
+    成本是次品率的一次函数，期望成本等于样本均值处的成本，只需一次矩阵-向量乘法；
+    CVaR 按 chunk_size 个决策分块计算 (决策数, 样本数) 的成本矩阵，内存占用与决策总数无关
+    返回 (最优决策, 目标值)，目标值相同时取枚举顺序中的第一个
+    """
+    if objective not in ('mean', 'cvar'):
+        raise ValueError(f"未知的目标: {objective}")
+    if not 0 < level < 1:
+        raise ValueError("level 必须在 0 和 1 之间（不含端点）")
+    _count('optimizer_calls')
+    coefficients = get_cost_coefficients(params, cache_dir)
+    samples = np.column_stack([np.ones(len(rate_samples['components'])),
+                               rate_samples['components'], rate_samples['products']])
+
+    if objective == 'mean':
+        values = coefficients @ samples.mean(axis=0)
+        # 稳健决策的工作量与 calculate_cost 的调用次数单独计数，两者不能相加比较
+        _count('robust_cost_evaluations', len(values))
+        code = int(np.argmin(values))
+        return decode_decision(params, code), float(values[code])
+
+    num_samples = len(samples)
+    num_tail = max(1, int(np.ceil((1 - level) * num_samples)))
+    best_code, best_value = None, np.inf
+    for start in range(0, len(coefficients), chunk_size):
+        costs = coefficients[start:start + chunk_size] @ samples.T
+        _count('robust_cost_evaluations', costs.size)
+        values = np.partition(costs, num_samples - num_tail, axis=1)[:, num_samples - num_tail:].mean(axis=1)
+        code = int(np.argmin(values))
+        if values[code] < best_value:
+            best_code, best_value = start + code, float(values[code])
+    return decode_decision(params, best_code), best_value
+
+def analyze_with_sampling_robust(params, true_rates, sample_sizes, num_samples=4000, objective='mean', level=0.9,
+                                 rng=None):
+    """
+    抽样检测一次，由检测结果得到次品率的 Beta 后验，并在 num_samples 个后验样本上求稳健决策
+
+    返回 (最优决策, 目标值, 后验均值)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    estimator = BetaPosteriorEstimator(len(true_rates['components']), len(true_rates['products']))
+    with _stage('sampling'):
+        defects = {name: rng.binomial(sample_sizes[name], true_rates[name]).tolist() for name in true_rates}
+        estimator.update(defects, sample_sizes)
+        rate_samples = estimator.sample(num_samples, rng)
+    with _stage('optimization'):
+        best_decisions, best_value = optimize_decisions_robust(params, rate_samples, objective, level)
+    return best_decisions, best_value, estimator.mean()
+
 # 问题2的参数
 params_2 = {
     'component_prices': [4, 18],
@@ -102,8 +678,27 @@ params_3 = {
     'market_price': 200
 }
 
-# 模拟抽样检测并优化决策
-def analyze_with_sampling(params, true_rates, sample_sizes):
+def estimate_rates_by_sampling(true_rates, sample_sizes, batched=False, rng=None, sampling_method='independent'):
+    """
+    模拟抽样检测并估计各零配件和产品的次品率，返回 estimated_rates 形式的字典
+
+    估计结果只取决于真实次品率和样本量，与成本参数无关，可在多组成本参数之间复用
+    batched: 为 True 时用 simulate_sampling_batch 一次性抽取全部样本，rng 为所用的 numpy.random.Generator，
+        sampling_method 为所用的方差缩减方法
+    """
+    if batched:
+        num_components = len(true_rates['components'])
+        est_means, _ = simulate_sampling_batch(
+            true_rates['components'] + true_rates['products'],
+            sample_sizes['components'] + sample_sizes['products'],
+            rng=rng,
+            method=sampling_method
+        )
+        return {
+            'components': est_means[:num_components].tolist(),
+            'products': est_means[num_components:].tolist()
+        }
+
     estimated_rates = {
         'components': [],
         'products': []
@@ -117,10 +712,251 @@ def analyze_with_sampling(params, true_rates, sample_sizes):
         est_mean, est_std = simulate_sampling(rate, size)
         estimated_rates['products'].append(est_mean)
     
-    best_decisions, best_cost = optimize_decisions(params, estimated_rates)
+    return estimated_rates
+
+# 模拟抽样检测并优化决策
+def analyze_with_sampling(params, true_rates, sample_sizes, batched=False, rng=None, cache=None,
+                          sampling_method='independent'):
+    """
+    抽样估计次品率并求最优决策，返回 (最优决策, 成本, 估计次品率)
+
+    batched, rng, sampling_method: 传给 estimate_rates_by_sampling
+    cache: 同一组参数的 DecisionCache，给定时用它代替穷举求解
+    """
+    estimated_rates = estimate_rates_by_sampling(true_rates, sample_sizes, batched, rng, sampling_method)
+    
+    with _stage('optimization'):
+        if cache is None:
+            best_decisions, best_cost = optimize_decisions(params, estimated_rates)
+        else:
+            best_decisions, best_cost = cache.optimize(estimated_rates)
     
     return best_decisions, best_cost, estimated_rates
 
+def _with_param_values(params, param_names, values):
+    """返回修改了指定参数的新参数字典，列表参数的每一项都设为同一取值"""
+    new_params = dict(params)
+    for name, value in zip(param_names, values):
+        if isinstance(params[name], list):
+            new_params[name] = [value] * len(params[name])
+        else:
+            new_params[name] = value
+    return new_params
+
+def _evaluate_sweep_point(args):
+    params, estimated_rates, true_rates, sample_sizes, seed_sequence = args
+    if estimated_rates is None:
+        estimated_rates = estimate_rates_by_sampling(true_rates, sample_sizes, batched=True,
+                                                     rng=np.random.default_rng(seed_sequence))
+    best_decisions, best_cost = optimize_decisions_separable(params, estimated_rates)
+    return best_cost, best_decisions
+
+def run_sensitivity_sweep(params, true_rates, sample_sizes, grid, processes=None, seed=None,
+                          common_random_numbers=True):
+    """
+    多参数敏感性分析：对 grid 中所有参数取值的笛卡尔积逐点求最优决策
+
+    common_random_numbers: 成本参数不影响抽样结果，为 True 时只用 numpy.random.default_rng(seed) 抽样估计一次次品率，
+        各网格点在同一组估计次品率下重新求解（公共随机数），点与点之间的差异只来自参数本身；
+        为 False 时每个网格点用由 SeedSequence(seed) 派生的独立随机数流各自抽样估计，用于对照
+    params: 基准参数，不会被修改
+    grid: {参数名: 取值序列}，列表参数的每一项都设为同一取值（与 plot_sensitivity_analysis 相同）
+    processes: 进程池大小，None 为 CPU 核数，1 表示在当前进程串行计算；结果与进程数无关
+    返回结构化数组，每行一个网格点，字段为各参数取值、best_cost 和各项决策
+    """
+    param_names = list(grid)
+    points = list(itertools.product(*(grid[name] for name in param_names)))
+    if common_random_numbers:
+        estimated_rates = estimate_rates_by_sampling(true_rates, sample_sizes, batched=True,
+                                                     rng=np.random.default_rng(seed))
+        tasks = [(_with_param_values(params, param_names, point), estimated_rates, None, None, None)
+                 for point in points]
+    else:
+        seed_sequences = np.random.SeedSequence(seed).spawn(len(points))
+        tasks = [(_with_param_values(params, param_names, point), None, true_rates, sample_sizes, seed_sequence)
+                 for point, seed_sequence in zip(points, seed_sequences)]
+    
+    results = _parallel_map(_evaluate_sweep_point, tasks, processes)
+    
+    num_components = len(params['component_prices'])
+    num_products = len(params['assembly_costs'])
+    dtype = [(name, float) for name in param_names] + [
+        ('best_cost', float),
+        ('component_inspections', bool, (num_components,)),
+        ('product_inspections', bool, (num_products,)),
+        ('product_disassembles', bool, (num_products,))
+    ]
+    sweep = np.zeros(len(points), dtype=dtype)
+    for name, values in zip(param_names, zip(*points)):
+        sweep[name] = values
+    sweep['best_cost'] = [cost for cost, _ in results]
+    for decision_type in ['component_inspections', 'product_inspections', 'product_disassembles']:
+        sweep[decision_type] = [decisions[decision_type] for _, decisions in results]
+    
+    return sweep
+
+def _run_repetition(args):
+    params, true_rates, sample_sizes, seed_sequence, sampling_method, cache_resolution = args
+    cache = None if cache_resolution is None else get_decision_cache(params, cache_resolution)
+    return analyze_with_sampling(params, true_rates, sample_sizes, batched=True,
+                                 rng=np.random.default_rng(seed_sequence), cache=cache,
+                                 sampling_method=sampling_method)
+
+def run_repeated_analyses(params, true_rates, sample_sizes, num_repetitions=100, seed=None, processes=None,
+                          sampling_method='independent', cache_resolution=None):
+    """
+    重复进行抽样分析，用于决策稳定性分析
+
+    每次重复使用由 SeedSequence(seed) 派生的独立随机数流，给定 seed 时结果与进程数无关
+    processes: 进程池大小，None 为 CPU 核数，1 表示在当前进程串行计算
+    sampling_method: 传给 simulate_sampling_batch 的方差缩减方法
+    cache_resolution: 给定时各进程用 get_decision_cache(params, cache_resolution) 复用最优决策，
+        决策和成本都与穷举求解相同
+    返回 (各次最优决策列表, 各次成本列表, 各次估计次品率列表)
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_repetitions)
+    tasks = [(params, true_rates, sample_sizes, seed_sequence, sampling_method, cache_resolution)
+             for seed_sequence in seed_sequences]
+    
+    results = _parallel_map(_run_repetition, tasks, processes)
+    
+    decisions_list = [decisions for decisions, _, _ in results]
+    costs = [cost for _, cost, _ in results]
+    rates_list = [rates for _, _, rates in results]
+    return decisions_list, costs, rates_list
+
+def variance_reduction_report(params, true_rates, sample_sizes, num_simulations=1000, num_replications=200, seed=None):
+    """
+    估计各方差缩减方法的有效样本量增益
+
+    考察在真实次品率下最优和次优的两种决策：对 SAMPLING_METHODS 中每种抽样方法重复 num_replications 次，
+    计算最优决策在估计次品率下成本的方差，增益 = 独立抽样的方差 / 该方法的方差，
+    即达到相同精度所需模拟次数的缩减倍数；
+    'common_random_numbers' 对应 run_sensitivity_sweep 的同名选项（optimize_decisions_robust 总是使用公共随机数）：
+    比较两种决策的成本差，在同一组估计次品率下计算（公共随机数）与各自独立抽样计算的方差之比
+    返回 {方法: {'variance': 方差, 'ess_gain': 增益}}
+    """
+    rng = np.random.default_rng(seed)
+    coefficients = get_cost_coefficients(params)
+    rates = np.concatenate([[1.0], true_rates['components'], true_rates['products']])
+    order = np.argsort(coefficients @ rates, kind='stable')
+    best = order[0]
+    # 次优决策取成本随次品率变化的方式与最优决策不同的第一个，否则两者的成本差是常数
+    second = next(code for code in order[1:] if not np.array_equal(coefficients[code, 1:], coefficients[best, 1:]))
+    all_rates = true_rates['components'] + true_rates['products']
+    all_sizes = sample_sizes['components'] + sample_sizes['products']
+
+    def estimated_rates(method):
+        est_means, _ = simulate_sampling_batch(all_rates, all_sizes, num_simulations, rng=rng, method=method)
+        return np.concatenate([[1.0], est_means])
+
+    report = {}
+    for method in SAMPLING_METHODS:
+        costs = [coefficients[best] @ estimated_rates(method) for _ in range(num_replications)]
+        report[method] = {'variance': float(np.var(costs, ddof=1))}
+
+    common = [(coefficients[best] - coefficients[second]) @ estimated_rates('independent')
+              for _ in range(num_replications)]
+    separate = [coefficients[best] @ estimated_rates('independent') - coefficients[second] @ estimated_rates('independent')
+                for _ in range(num_replications)]
+    report['common_random_numbers'] = {'variance': float(np.var(common, ddof=1)),
+                                       'ess_gain': float(np.var(separate, ddof=1) / np.var(common, ddof=1))}
+
+    for method in SAMPLING_METHODS:
+        report[method]['ess_gain'] = report['independent']['variance'] / report[method]['variance']
+    return report
+
+def _decision_lines(params):
+    """
+    每个决策项的两条成本直线（选择是/否时成本关于对应次品率的截距和斜率）及其依赖的次品率序号
+
+    次品率序号依次为各零配件、各产品；每个决策项的成本只依赖其中一个次品率
+    """
+    num_components = len(params['component_prices'])
+    num_products = len(params['assembly_costs'])
+    zeros = {'components': [0.0] * num_components, 'products': [0.0] * num_products}
+    ones = {'components': [1.0] * num_components, 'products': [1.0] * num_products}
+    _, true_at_zero, false_at_zero = decision_terms(params, zeros)
+    _, true_at_one, false_at_one = decision_terms(params, ones)
+    items = np.concatenate([np.arange(num_components), num_components + np.arange(num_products),
+                            num_components + np.arange(num_products)])
+    return items, true_at_zero, true_at_one - true_at_zero, false_at_zero, false_at_one - false_at_zero
+
+def _expected_min_of_lines(intercept_1, slope_1, intercept_2, slope_2, alpha, beta):
+    """p ~ Beta(alpha, beta) 时 E[min(intercept_1 + slope_1 p, intercept_2 + slope_2 p)] 的精确值"""
+    from scipy import stats
+    mean = alpha / (alpha + beta)
+    # min(l1, l2) = l2 + min(0, l1 - l2)，l1 - l2 = d0 + d1 p 只在交点一侧为负
+    d0, d1 = intercept_1 - intercept_2, slope_1 - slope_2
+    base = intercept_2 + slope_2 * mean
+    if d1 == 0:
+        return base + min(d0, 0.0)
+    crossing = np.clip(-d0 / d1, 0.0, 1.0)
+    below = d0 * stats.beta.cdf(crossing, alpha, beta) + d1 * mean * stats.beta.cdf(crossing, alpha + 1, beta)
+    if d1 > 0:
+        return base + below  # 交点左侧 l1 更低
+    return base + (d0 + d1 * mean) - below  # 交点右侧 l1 更低
+
+def optimize_sample_sizes(params, prior_rates, prior_strength=10, max_sample_size=500, sampling_costs=None,
+                          lot_size=1000):
+    """
+    预后验分析：为每个零配件/产品选择使抽样成本与决策期望损失之和最小的样本量
+
+    次品率的先验为 Beta(a, b)，均值取 prior_rates 中的对应值，a + b = prior_strength；
+    抽检 n 件时次品数服从 Beta-二项分布，按后验均值 (a + x) / (a + b + n) 作决策。
+    每个决策项只依赖一个次品率，对所有候选 n 和所有可能的次品数一次向量化计算期望成本：
+    期望成本 = n * 单件抽样成本 + lot_size * E[按后验均值决策时的单件成本]
+    期望损失为其中决策成本部分与已知真实次品率时（完全信息）的差值
+
+    prior_rates: {'components': [...], 'products': [...]} 形式的先验均值
+    sampling_costs: 同样形式的单件抽样成本，默认为各项的检测成本
+    lot_size: 一次抽样结果所适用的产品数量
+    返回 {'sample_sizes': 与 prior_rates 同形式的最优样本量, 'candidates': 候选样本量,
+          'expected_costs': (项数, 候选数) 期望成本, 'expected_losses': (项数, 候选数) 期望损失}
+    """
+    from scipy import stats
+    num_components = len(params['component_prices'])
+    means = np.asarray(prior_rates['components'] + prior_rates['products'], dtype=float)
+    if prior_strength <= 0:
+        raise ValueError("prior_strength 必须为正数")
+    if np.any((means <= 0) | (means >= 1)):
+        raise ValueError("先验次品率必须在 0 和 1 之间（不含端点）")
+    if sampling_costs is None:
+        sampling_costs = {'components': params['component_inspect_costs'], 'products': params['product_inspect_costs']}
+    unit_costs = np.asarray(list(sampling_costs['components']) + list(sampling_costs['products']), dtype=float)
+    items, true_intercepts, true_slopes, false_intercepts, false_slopes = _decision_lines(params)
+
+    candidates = np.arange(max_sample_size + 1)
+    defects = np.arange(max_sample_size + 1)
+    expected_costs = np.empty((len(means), len(candidates)))
+    expected_losses = np.empty((len(means), len(candidates)))
+    for item, mean in enumerate(means):
+        alpha, beta = mean * prior_strength, (1 - mean) * prior_strength
+        flags = np.flatnonzero(items == item)
+
+        # (候选样本量, 次品数) 网格，次品数超过样本量的格子概率为 0
+        pmf = stats.betabinom.pmf(defects[None, :], candidates[:, None], alpha, beta)
+        posterior_means = (alpha + defects[None, :]) / (alpha + beta + candidates[:, None])
+        decision_costs = np.zeros_like(posterior_means)
+        perfect_cost = 0.0
+        for flag in flags:
+            decision_costs += np.minimum(true_intercepts[flag] + true_slopes[flag] * posterior_means,
+                                         false_intercepts[flag] + false_slopes[flag] * posterior_means)
+            perfect_cost += _expected_min_of_lines(true_intercepts[flag], true_slopes[flag],
+                                                   false_intercepts[flag], false_slopes[flag], alpha, beta)
+        expected_decision_costs = (pmf * decision_costs).sum(axis=1)
+
+        expected_losses[item] = lot_size * (expected_decision_costs - perfect_cost)
+        expected_costs[item] = candidates * unit_costs[item] + lot_size * expected_decision_costs
+
+    best = candidates[np.argmin(expected_costs, axis=1)]
+    return {
+        'sample_sizes': {'components': best[:num_components].tolist(), 'products': best[num_components:].tolist()},
+        'candidates': candidates,
+        'expected_costs': expected_costs,
+        'expected_losses': expected_losses
+    }
+
 # 分析问题2
 true_rates_2 = {
     'components': [0.1, 0.1],
@@ -131,8 +967,6 @@ sample_sizes_2 = {
     'products': [100]
 }
 
-results_2 = analyze_with_sampling(params_2, true_rates_2, sample_sizes_2)
-
 # 分析问题3
 true_rates_3 = {
     'components': [0.1] * 8,
@@ -143,20 +977,9 @@ sample_sizes_3 = {
     'products': [100, 100, 100]
 }
 
-results_3 = analyze_with_sampling(params_3, true_rates_3, sample_sizes_3)
-
-print("问题2结果:")
-print("最优决策:", results_2[0])
-print("估计成本:", results_2[1])
-print("估计次品率:", results_2[2])
-
-print("\n问题3结果:")
-print("最优决策:", results_3[0])
-print("估计成本:", results_3[1])
-print("估计次品率:", results_3[2])
-
 def plot_defect_rate_comparison(true_rates, estimated_rates, problem_num):
     """绘制估计次品率与真实次品率的比较图"""
+    plt = _pyplot()
     components = [f'零件{i+1}' for i in range(len(true_rates['components']))]
     products = [f'产品{i+1}' for i in range(len(true_rates['products']))]
     labels = components + products
@@ -178,6 +1001,7 @@ def plot_defect_rate_comparison(true_rates, estimated_rates, problem_num):
 
 def plot_decision_stability(decisions_list, problem_num):
     """绘制最优决策的稳定性分析图"""
+    plt = _pyplot()
     decision_types = ['component_inspections', 'product_inspections', 'product_disassembles']
     decision_names = ['零件检测', '产品检测', '产品拆解']
 
@@ -201,6 +1025,7 @@ def plot_decision_stability(decisions_list, problem_num):
 
 def plot_cost_distribution(costs, problem_num):
     """绘制成本分布图"""
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
     plt.hist(costs, bins=30, edgecolor='black')
     plt.xlabel('成本', fontsize=21)
@@ -209,13 +1034,22 @@ def plot_cost_distribution(costs, problem_num):
     plt.savefig(f'./4/cost_variability_{problem_num}.png', dpi=300)
     plt.close()
 
-def plot_sensitivity_analysis(params, true_rates, sample_sizes, param_name, param_range, problem_num):
-    """绘制敏感性分析图"""
+def plot_sensitivity_analysis(params, true_rates, sample_sizes, param_name, param_range, problem_num,
+                              estimated_rates=None):
+    """
+    绘制敏感性分析图
+
+    成本参数不影响抽样结果，因此只抽样估计一次次品率（也可由 estimated_rates 直接给出），
+    各取值点只重新求解成本最优的决策，曲线上各点之间没有抽样噪声
+    """
+    plt = _pyplot()
+    if estimated_rates is None:
+        estimated_rates = estimate_rates_by_sampling(true_rates, sample_sizes)
     costs = []
     for value in param_range:
-        temp_params = params.copy()
-        temp_params[param_name] = [value] * len(temp_params[param_name])
-        _, cost, _ = analyze_with_sampling(temp_params, true_rates, sample_sizes)
+        temp_params = _with_param_values(params, [param_name], [value])
+        with _stage('optimization'):
+            _, cost = optimize_decisions_separable(temp_params, estimated_rates)
         costs.append(cost)
 
     plt.figure(figsize=(10, 6))
@@ -244,34 +1078,35 @@ if __name__ == "__main__":
     # 创建保存图片的文件夹
     os.makedirs('./4', exist_ok=True)
 
-    # 多次运行模拟以获得稳定性分析数据
-    num_simulations = 100
-    decisions_list_2 = []
-    costs_2 = []
-    decisions_list_3 = []
-    costs_3 = []
-
-    for _ in range(num_simulations):
-        decisions_2, cost_2, rates_2 = analyze_with_sampling(params_2, true_rates_2, sample_sizes_2)
-        decisions_list_2.append(decisions_2)
-        costs_2.append(cost_2)
+    # 设置环境变量 INSTRUMENT_REPORT=<路径.json> 时统计调用次数、各阶段耗时和峰值内存
+    instrument_report = os.environ.get('INSTRUMENT_REPORT')
+    if instrument_report:
+        enable_instrumentation()
 
-        decisions_3, cost_3, rates_3 = analyze_with_sampling(params_3, true_rates_3, sample_sizes_3)
-        decisions_list_3.append(decisions_3)
-        costs_3.append(cost_3)
+    # 多次运行模拟以获得稳定性分析数据（固定随机种子，结果可复现；估计次品率相近时复用缓存的最优决策）
+    num_simulations = 100
+    decisions_list_2, costs_2, rates_list_2 = run_repeated_analyses(
+        params_2, true_rates_2, sample_sizes_2, num_simulations, seed=2024, cache_resolution=0.01)
+    decisions_list_3, costs_3, rates_list_3 = run_repeated_analyses(
+        params_3, true_rates_3, sample_sizes_3, num_simulations, seed=2025, cache_resolution=0.01)
+    rates_2 = rates_list_2[-1]
+    rates_3 = rates_list_3[-1]
 
     # 绘制可视化图表
-    plot_defect_rate_comparison(true_rates_2, rates_2, 2)
-    plot_defect_rate_comparison(true_rates_3, rates_3, 3)
+    with _stage('plotting'):
+        plot_defect_rate_comparison(true_rates_2, rates_2, 2)
+        plot_defect_rate_comparison(true_rates_3, rates_3, 3)
 
-    plot_decision_stability(decisions_list_2, 2)
-    plot_decision_stability(decisions_list_3, 3)
+        plot_decision_stability(decisions_list_2, 2)
+        plot_decision_stability(decisions_list_3, 3)
 
-    plot_cost_distribution(costs_2, 2)
-    plot_cost_distribution(costs_3, 3)
+        plot_cost_distribution(costs_2, 2)
+        plot_cost_distribution(costs_3, 3)
 
-    plot_sensitivity_analysis(params_2, true_rates_2, sample_sizes_2, 'component_inspect_costs', np.linspace(1, 5, 20), 2)
-    plot_sensitivity_analysis(params_3, true_rates_3, sample_sizes_3, 'component_inspect_costs', np.linspace(1, 5, 20), 3)
+        plot_sensitivity_analysis(params_2, true_rates_2, sample_sizes_2, 'component_inspect_costs', np.linspace(1, 5, 20), 2,
+                                  estimated_rates=rates_2)
+        plot_sensitivity_analysis(params_3, true_rates_3, sample_sizes_3, 'component_inspect_costs', np.linspace(1, 5, 20), 3,
+                                  estimated_rates=rates_3)
 
     print("问题2结果:")
     print("最优决策:", decisions_list_2[-1])
@@ -282,3 +1117,39 @@ if __name__ == "__main__":
     print("最优决策:", decisions_list_3[-1])
     print("估计成本:", costs_3[-1])
     print("估计次品率:", rates_3)
+
+    # 以各项次品率的标称值为先验均值，按抽样成本与决策期望损失选择样本量
+    for problem_num, params, true_rates in [(2, params_2, true_rates_2), (3, params_3, true_rates_3)]:
+        plan = optimize_sample_sizes(params, true_rates)
+        print(f"\n问题{problem_num}建议样本量:", plan['sample_sizes'])
+
+    # 各方差缩减方法的有效样本量增益
+    for problem_num, params, true_rates, sample_sizes in [(2, params_2, true_rates_2, sample_sizes_2),
+                                                          (3, params_3, true_rates_3, sample_sizes_3)]:
+        report = variance_reduction_report(params, true_rates, sample_sizes, num_replications=100, seed=2024)
+        print(f"\n问题{problem_num}方差缩减的有效样本量增益:",
+              {method: round(result['ess_gain'], 1) for method, result in report.items()})
+
+    # 检测结果分批到达时逐批更新次品率的后验分布
+    estimator = BetaPosteriorEstimator(len(true_rates_3['components']), len(true_rates_3['products']))
+    stream_rng = np.random.default_rng(2024)
+    batch_sizes = {name: [10] * len(rates) for name, rates in true_rates_3.items()}
+    for _ in range(10):
+        batch_defects = {name: stream_rng.binomial(batch_sizes[name], rates).tolist() for name, rates in true_rates_3.items()}
+        estimator.update(batch_defects, batch_sizes)
+    lower, upper = estimator.credible_interval()
+    print("\n问题3分批检测后的后验均值:", estimator.mean())
+    print("95% 可信区间下限:", lower)
+    print("95% 可信区间上限:", upper)
+
+    # 在后验样本上求稳健决策
+    robust_rng = np.random.default_rng(2024)
+    for objective in ['mean', 'cvar']:
+        robust_decisions, robust_value, _ = analyze_with_sampling_robust(params_3, true_rates_3, sample_sizes_3,
+                                                                         objective=objective, rng=robust_rng)
+        print(f"\n问题3稳健决策（{objective}）:", robust_decisions)
+        print("目标值:", robust_value)
+
+    if instrument_report:
+        disable_instrumentation().save(instrument_report)
+        print(f"\n运行统计已保存到 {instrument_report}")
@@ -0,0 +1,255 @@
+"""
+热点路径基准测试
+
+覆盖各题的 optimize_decisions、simulate_sampling、analyze_with_sampling、
+design_sampling_plan 和 simulate_sampling_plan，问题规模从第2题（2个零配件）、第3题（8个零配件）
+到合成的 20 个以上决策的生产线；所有用例使用固定随机种子
+
+用法:
+    python benchmark.py --output baseline.json          # 运行并保存基线
+    python benchmark.py --compare baseline.json         # 与基线比较，变慢超过阈值时返回非零退出码
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import separability
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename):
+    """按文件路径导入题目脚本（文件名以数字开头，不能直接 import）"""
+    name = 'bench_' + os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_line_params(num_components, num_products, seed):
+    """生成合成的多道工序参数，同时包含第3题（含次品率）和第4题所需的字段"""
+    rng = np.random.default_rng(seed)
+    return {
+        'component_defect_rates': rng.uniform(0.02, 0.2, num_components).tolist(),
+        'component_prices': rng.integers(2, 20, num_components).tolist(),
+        'component_inspect_costs': rng.integers(1, 4, num_components).tolist(),
+        'product_defect_rates': rng.uniform(0.02, 0.2, num_products).tolist(),
+        'assembly_costs': rng.integers(4, 12, num_products).tolist(),
+        'product_inspect_costs': rng.integers(2, 8, num_products).tolist(),
+        'disassemble_costs': rng.integers(4, 12, num_products).tolist(),
+        'replacement_cost': 40,
+        'market_price': 200
+    }
+
+
+def line_rates(params):
+    return {'components': params['component_defect_rates'], 'products': params['product_defect_rates']}
+
+
+def build_cases(full=False):
+    """
+    返回基准用例列表，每个用例为 (名称, 规模说明, 每次调用处理的工作量, 准备函数)
+
+    准备函数返回无参可调用对象；工作量用于计算吞吐量（如每次调用评估的决策组合数）
+    """
+    p1 = load_script('1.py')
+    p1v = load_script('1-verification.py')
+    p2 = load_script('2.py')
+    p3 = load_script('3.py')
+    p4 = load_script('4.py')
+
+    cases = []
+
+    # 第1题：抽样方案
+    cases.append(('1.design_sampling_plan', 'p=0.10', 1,
+                  lambda: lambda: p1.design_sampling_plan(0.10)))
+    cases.append(('1.get_sampling_plan', 'p=0.10 (cached)', 1,
+                  lambda: lambda: p1.get_sampling_plan(0.10)))
+
+    def simulate_plan_case():
+        np.random.seed(2024)
+        return lambda: p1v.simulate_sampling_plan(0.11, 0.10, 139, num_simulations=1000)
+    cases.append(('1v.simulate_sampling_plan', 'n=139, 1000 draws', 1000, simulate_plan_case))
+    cases.append(('1v.exact_sampling_plan_rates', 'n=139, 1000 rates', 1000,
+                  lambda: lambda: p1v.exact_sampling_plan_rates(np.linspace(0, 0.3, 1000), 0.10, 139)))
+
+    # 第2题：单一产品（4个决策）
+    situation = p2.situations[0]
+    cases.append(('2.optimize_decisions', '4 decisions', 2 ** 4,
+                  lambda: lambda: p2.optimize_decisions(situation)))
+
+    def batch_case():
+        columns = {name: np.full(100000, value, dtype=float) for name, value in situation.items()}
+        return lambda: p2.analyze_situations_batch(columns)
+    cases.append(('2.analyze_situations_batch', '100000 scenarios', 100000, batch_case))
+
+    # 第3题及合成生产线
+    brute_force_sizes = [(8, 3), (10, 3)] + ([(14, 3)] if full else [])
+    for num_components, num_products in brute_force_sizes:
+        params = make_line_params(num_components, num_products, seed=num_components)
+        num_decisions = num_components + 2 * num_products
+        cases.append(('3.optimize_decisions', f'{num_decisions} decisions', 2 ** num_decisions,
+                      lambda params=params: lambda: p3.optimize_decisions(params)))
+    for num_components, num_products in [(8, 3), (14, 3), (16, 3)]:
+        params = make_line_params(num_components, num_products, seed=num_components)
+        num_decisions = num_components + 2 * num_products
+        cases.append(('3.optimize_decisions_vectorized', f'{num_decisions} decisions', 2 ** num_decisions,
+                      lambda params=params: lambda: p3.optimize_decisions_vectorized(params)))
+    for num_components, num_products in [(8, 3), (14, 3), (200, 50)]:
+        params = make_line_params(num_components, num_products, seed=num_components)
+        num_decisions = num_components + 2 * num_products
+        cases.append(('3.optimize_decisions_separable', f'{num_decisions} decisions', num_decisions,
+                      lambda params=params: lambda: p3.optimize_decisions_separable(params)))
+
+    # 第4题：抽样 + 决策
+    for num_components, num_products in [(2, 1), (8, 3)] + ([(14, 3)] if full else []):
+        params = make_line_params(num_components, num_products, seed=num_components)
+        num_decisions = num_components + 2 * num_products
+        cases.append(('4.optimize_decisions', f'{num_decisions} decisions', 2 ** num_decisions,
+                      lambda params=params: lambda: p4.optimize_decisions(params, line_rates(params))))
+        if num_decisions > separability.BRUTE_FORCE_FLAGS:  # 决策更少时直接穷举，与 optimize_decisions 相同
+            cases.append(('4.optimize_decisions_separable', f'{num_decisions} decisions', num_decisions,
+                          lambda params=params: lambda: p4.optimize_decisions_separable(params, line_rates(params))))
+        cases.append(('4.optimize_decisions_affine', f'{num_decisions} decisions', 2 ** num_decisions,
+                      lambda params=params: lambda: p4.optimize_decisions_affine(params, line_rates(params))))
+
+    def simulate_sampling_case():
+        np.random.seed(2024)
+        return lambda: p4.simulate_sampling(0.10, 100)
+    cases.append(('4.simulate_sampling', 'n=100, 1000 draws', 1000, simulate_sampling_case))
+
+    def simulate_sampling_batch_case():
+        rng = np.random.default_rng(2024)
+        return lambda: p4.simulate_sampling_batch([0.10] * 11, [100] * 11, rng=rng)
+    cases.append(('4.simulate_sampling_batch', '11 items, 1000 draws', 11000, simulate_sampling_batch_case))
+
+    for label, params, true_rates, sample_sizes in [
+        ('problem 2', p4.params_2, p4.true_rates_2, p4.sample_sizes_2),
+        ('problem 3', p4.params_3, p4.true_rates_3, p4.sample_sizes_3)
+    ]:
+        def analyze_case(params=params, true_rates=true_rates, sample_sizes=sample_sizes):
+            np.random.seed(2024)
+            return lambda: p4.analyze_with_sampling(params, true_rates, sample_sizes)
+        cases.append(('4.analyze_with_sampling', label, 1, analyze_case))
+
+        def analyze_batched_case(params=params, true_rates=true_rates, sample_sizes=sample_sizes):
+            rng = np.random.default_rng(2024)
+            return lambda: p4.analyze_with_sampling(params, true_rates, sample_sizes, batched=True, rng=rng)
+        cases.append(('4.analyze_with_sampling[batched]', label, 1, analyze_batched_case))
+
+        def analyze_cached_case(params=params, true_rates=true_rates, sample_sizes=sample_sizes):
+            rng = np.random.default_rng(2024)
+            # 每次调用新建缓存：计时包含冷启动时的未命中，与单次运行的实际情况一致
+            return lambda: p4.analyze_with_sampling(params, true_rates, sample_sizes, batched=True, rng=rng,
+                                                    cache=p4.DecisionCache(params))
+        cases.append(('4.analyze_with_sampling[batched+cache]', label, 1, analyze_cached_case))
+
+    return cases
+
+
+# 与基线比较时两边都至少需要的重复次数，次数更少的用例中位数不可靠，不参与比较
+MIN_REPEATS = 5
+
+
+def time_case(func, min_time=0.5, min_repeats=MIN_REPEATS, max_repeats=1000):
+    """先预热一次，再重复调用直到累计时间超过 min_time 且至少调用 min_repeats 次，返回每次调用耗时列表（秒）"""
+    func()
+    timings = []
+    total = 0.0
+    while (total < min_time or len(timings) < min_repeats) and len(timings) < max_repeats:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return timings
+
+
+def run_benchmarks(full=False, name_filter=None, min_time=0.5):
+    results = []
+    for name, size, work, setup in build_cases(full):
+        if name_filter and name_filter not in name:
+            continue
+        timings = time_case(setup(), min_time=min_time)
+        best = min(timings)
+        result = {
+            'name': name,
+            'size': size,
+            'repeats': len(timings),
+            'best_seconds': best,
+            'median_seconds': float(np.median(timings)),
+            'calls_per_second': 1 / best,
+            'work_per_second': work / best
+        }
+        results.append(result)
+        print(f"{name:40s} {size:22s} {best * 1e3:12.4f} ms/call {result['work_per_second']:14.4g} items/s")
+    return results
+
+
+def compare_with_baseline(results, baseline_path, tolerance, min_delta=5e-5):
+    """
+    与基线比较耗时中位数，返回回归用例数
+
+    中位数变慢超过 tolerance（比例）且绝对值多出 min_delta 秒以上的用例视为回归；
+    单次最佳耗时受偶然的快速调用影响较大，亚毫秒级用例的比例又容易被计时噪声放大，因此都不单独作为判据；
+    任一边重复次数少于 MIN_REPEATS 的用例不参与比较
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\n与基线 {baseline_path} 比较（耗时中位数）:")
+    for result in results:
+        reference = baseline.get((result['name'], result['size']))
+        if reference is None:
+            continue
+        if min(result['repeats'], reference['repeats']) < MIN_REPEATS:
+            print(f"{result['name']:40s} {result['size']:22s} 重复次数不足 {MIN_REPEATS} 次，跳过")
+            continue
+        ratio = result['median_seconds'] / reference['median_seconds']
+        flag = ''
+        if ratio > 1 + tolerance and result['median_seconds'] - reference['median_seconds'] > min_delta:
+            flag = '  <-- 回归'
+            regressions += 1
+        print(f"{result['name']:40s} {result['size']:22s} {ratio:8.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热点路径基准测试')
+    parser.add_argument('--output', help='将结果保存为 JSON（可作为基线）')
+    parser.add_argument('--compare', help='与指定的基线 JSON 比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的中位数变慢比例，默认 0.25')
+    parser.add_argument('--min-delta', type=float, default=5e-5,
+                        help='中位数至少变慢该秒数才视为回归，默认 5e-5（0.05 ms）')
+    parser.add_argument('--filter', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--min-time', type=float, default=0.5, help='每个用例的最少计时秒数')
+    parser.add_argument('--full', action='store_true', help='包含 20 个决策的穷举用例（较慢）')
+    args = parser.parse_args()
+
+    results = run_benchmarks(full=args.full, name_filter=args.filter, min_time=args.min_time)
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare and compare_with_baseline(results, args.compare, args.tolerance, args.min_delta):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+可加成本模型的可分性检查与逐项求解，2.py、3.py、4.py 共用
+
+成本可写成 常数项 + 各决策项之和、且每项只取决于自身的取值时，逐项取较小成本即为全局最优
+"""
+import functools
+import itertools
+import numpy as np
+
+# 决策数不超过该值时直接穷举：2^n 种组合的计算量不比可分性检查大
+BRUTE_FORCE_FLAGS = 6
+
+# 决策数不超过该值时检查全部两两翻转的组合，超过时只检查相邻和相距一半的两两组合
+PAIR_CHECK_FLAGS = 16
+
+@functools.lru_cache(maxsize=64)
+def flip_matrix(num_flags):
+    """
+    可分性检查所用的决策组合，每行一个布尔决策向量（只读，同一决策数只构造一次）
+
+    第一行为全部取"否"的基准，其后每行翻转一项，再加上两两翻转的组合：
+    决策数不超过 PAIR_CHECK_FLAGS 时为全部 n(n-1)/2 对；超过时只取固定的至多 2n 对
+    （第 i 项与第 i+1 项、第 i+n/2 项，下标按 n 取模），其余各对之间的交叉项不检查
+    """
+    flips = [()] + [(i,) for i in range(num_flags)]
+    if num_flags <= PAIR_CHECK_FLAGS:
+        flips += list(itertools.combinations(range(num_flags), 2))
+    else:
+        pairs = {tuple(sorted((i, (i + offset) % num_flags)))
+                 for i in range(num_flags) for offset in (1, num_flags // 2)}
+        flips += sorted(pairs)
+    matrix = np.zeros((len(flips), num_flags), dtype=bool)
+    for row, flipped in enumerate(flips):
+        matrix[row, list(flipped)] = True
+    matrix.flags.writeable = False
+    return matrix
+
+def is_separable(costs, constant, cost_if_true, cost_if_false, rtol=1e-9):
+    """
+    确定性地检查成本是否等于 constant + 每项按决策取 cost_if_true 或 cost_if_false 之和
+
+    在 flip_matrix 的每一行上比较：单项翻转可发现分解与实际成本不一致的项，
+    两两翻转可发现两项之间的交叉项（决策数超过 PAIR_CHECK_FLAGS 时只检查其中一部分），更高阶的交叉项不检查
+    costs: 接收 (行数, 决策数) 布尔矩阵、返回每行总成本的函数，各题传入逐行调用 calculate_cost 的函数
+    调用 calculate_cost 的次数在决策数不超过 PAIR_CHECK_FLAGS 时至多 137 次，超过时为 O(决策数)；
+    每次调用为 O(决策数)，因此检查总计 O(决策数²)，比逐项求解本身的 O(决策数) 高一阶
+    """
+    cost_if_true = np.asarray(cost_if_true, dtype=float)
+    cost_if_false = np.asarray(cost_if_false, dtype=float)
+    matrix = flip_matrix(len(cost_if_true))
+    separable_costs = constant + np.where(matrix, cost_if_true, cost_if_false).sum(axis=1)
+    return bool(np.allclose(separable_costs, costs(matrix), rtol=rtol, atol=0))
+
+def separable_flags(constant, cost_if_true, cost_if_false):
+    """逐项取较小成本；两项之差在累加的舍入误差以内时视为相同，取"是"，与各题 optimize_decisions 的枚举顺序一致"""
+    cost_if_true = np.asarray(cost_if_true, dtype=float)
+    cost_if_false = np.asarray(cost_if_false, dtype=float)
+    tolerance = 64 * np.finfo(float).eps * (abs(constant) + np.maximum(np.abs(cost_if_true), np.abs(cost_if_false)).sum())
+    return cost_if_true <= cost_if_false + tolerance